@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check the import time of the vsadmin entry points against a budget
+
+Every scenario runs in a fresh interpreter with ``-X importtime``. The
+modules the interpreter imports on its own (``python -c pass``) are not
+counted, the best of --repeat runs is compared with the budget:
+
+    PYTHONPATH=. python benchmarks/bench_import.py
+
+The script exits with 1 if a scenario is over its budget or imports a
+module it must not load, e.g. the vSAN bindings for ``vsadmin --help``.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# name, code, budget in ms, modules that must not be imported
+SCENARIOS = [
+    ('vsadmin --help',
+     'from vsadmin.cli import cli; cli(["--help"])', 120,
+     ('pyVmomi', 'requests', 'vsadmin.tools.vsanmgmtObjects')),
+    ('vsadmin search --help',
+     'from vsadmin.cli import cli; cli(["search", "--help"])', 120,
+     ('pyVmomi', 'requests', 'vsadmin.tools.vsanmgmtObjects')),
+    ('import vsadmin.tools.tools',
+     'import vsadmin.tools.tools', 200,
+     ('requests', 'pyVim.connect', 'numpy',
+      'vsadmin.tools.vsanmgmtObjects', 'vsadmin.tools.vsanStoragePolicy')),
+]
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(code):
+    """Return the top-level imports of code as (module, cumulative µs) and all imported modules"""
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', code],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    top_level = []
+    modules = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if match is None:
+            continue
+        modules.add(match.group(4))
+        # The children of an import are indented by two spaces per level
+        if len(match.group(3)) == 1:
+            top_level.append((match.group(4), int(match.group(2))))
+    return top_level, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs, the best one is compared')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the budgets, for slow machines')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the slowest top-level imports')
+    args = parser.parse_args()
+
+    startup = import_times('pass')[1]
+    failed = False
+    print('{:<28} {:>10} {:>10}'.format('scenario', 'ms', 'budget ms'))
+    for name, code, budget, forbidden in SCENARIOS:
+        best = None
+        for _ in range(args.repeat):
+            top_level, modules = import_times(code)
+            top_level = [(module, usec) for module, usec in top_level if module not in startup]
+            total = sum(usec for module, usec in top_level) / 1000.0
+            if best is None or total < best[0]:
+                best = (total, top_level, modules)
+        total, top_level, modules = best
+        budget *= args.scale
+        print('{:<28} {:>10.1f} {:>10.1f}{}'.format(name, total, budget, '  OVER BUDGET' if total > budget else ''))
+        if args.verbose:
+            for module, usec in sorted(top_level, key=lambda item: -item[1])[:10]:
+                print('    {:<40} {:>8.1f}'.format(module, usec / 1000.0))
+        loaded = [module for module in forbidden if module in modules]
+        for module in loaded:
+            print('    imports {}'.format(module), file=sys.stderr)
+        failed = failed or total > budget or bool(loaded)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
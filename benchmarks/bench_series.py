@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the perf sample aggregation of SeriesTable with per-metric lists
+
+Builds a synthetic QueryPerf result, no vCenter needed:
+
+    PYTHONPATH=. python benchmarks/bench_series.py --vms 5000
+
+The reductions are vectorized when NumPy is installed.
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+from types import SimpleNamespace as NS
+import vsadmin.tools.perfSeries
+
+
+def build_result(vms, counters, instances, samples, seed=0):
+    rnd = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    sample_info = [NS(timestamp=start + datetime.timedelta(seconds=20 * n), interval=20) for n in range(samples)]
+    result = []
+    for vm in range(vms):
+        values = []
+        for counter in range(counters):
+            for instance in range(instances):
+                # About one sample in a hundred could not be collected
+                values.append(NS(id=NS(counterId=counter, instance='scsi0:{}'.format(instance)),
+                                 value=[-1 if rnd.random() < 0.01 else rnd.randint(0, 500) for _ in range(samples)]))
+        result.append(NS(entity=NS(_moId='vm-{}'.format(vm)), sampleInfo=sample_info, value=values))
+    return result
+
+
+def metric_key(entity, counter_id, instance):
+    return (entity._moId, counter_id, instance)
+
+
+def legacy(result, interval):
+    # What print_vm_info did: one list per metric, summed and divided by the minutes
+    results = {}
+    for entity_metric in result:
+        for series in entity_metric.value:
+            results[metric_key(entity_metric.entity, series.id.counterId, series.id.instance)] = list(series.value)
+    return dict((key, float(sum(values)) / interval) for key, values in results.items())
+
+
+def list_bytes(result):
+    # The per-metric lists of legacy() and the int objects they point to
+    return sum(sys.getsizeof(series.value) + sum(sys.getsizeof(value) for value in series.value)
+               for entity_metric in result for series in entity_metric.value)
+
+
+def bench(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<36} {:>9.1f} ms  {:>8} series'.format(label, best * 1000, len(value)))
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vms', type=int, default=2000, help='number of virtual machines')
+    parser.add_argument('--counters', type=int, default=4, help='counters per virtual machine')
+    parser.add_argument('--instances', type=int, default=2, help='instances per counter')
+    parser.add_argument('--samples', type=int, default=60, help='samples per series (60 for 20 realtime minutes)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is shown')
+    args = parser.parse_args()
+
+    result = build_result(args.vms, args.counters, args.instances, args.samples)
+    print('{} series of {} samples, NumPy {}'.format(args.vms * args.counters * args.instances, args.samples,
+                                                     'available' if vsadmin.tools.perfSeries.load_numpy() else 'not installed'))
+    bench('legacy list sum/interval', lambda: legacy(result, 20), args.repeat)
+    table = bench('SeriesTable build', lambda: vsadmin.tools.perfSeries.SeriesTable.from_entity_metrics(result, metric_key), args.repeat)
+    for how in vsadmin.tools.perfSeries.REDUCTIONS:
+        bench('SeriesTable {}'.format(how), lambda: table.reduce(how), args.repeat)
+    print('samples held in {:.1f} MB as lists, {:.1f} MB in the SeriesTable buffer'.format(
+        list_bytes(result) / 1e6, table.values.itemsize * len(table.values) / 1e6))
+
+if __name__ == '__main__':
+    main()
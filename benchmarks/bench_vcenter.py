@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure round trips, bytes and wall time of vsadmin code paths offline
+
+Every case runs on a fresh vCenter object connected to a synthetic
+inventory (see tests/fakevc.py), so lazily loaded state is cold:
+
+    PYTHONPATH=. python benchmarks/bench_vcenter.py --vms 5000 --latency 2
+
+Save the results with --json and pass them as --baseline in CI to fail
+when a code path needs more round trips than before.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+import vsadmin.tools.batch
+import vsadmin.tools.cache
+import vsadmin.tools.top
+import vsadmin.tools.watch
+from tests import fakevc
+
+
+def build_cases(fake, report_vms, batch_lines):
+    vms = fake.vms
+    first = vms[0]
+    last = vms[-1]
+
+    def resolve(path):
+        return fake.resolve(last, path)
+
+    def print_vms_info(verbose, interval=20):
+        def run(vc):
+            vc.print_vms_info(vms[:report_vms], interval=interval, verbose=verbose)
+        return run
+
+    def batch(vc):
+        lines = []
+        for i, vm in enumerate(vms[:batch_lines]):
+            kind = ('ip', 'hostname', 'name', 'mac')[i % 4]
+            if kind == 'ip':
+                lines.append(fake.resolve(vm, 'guest.ipAddress'))
+            elif kind == 'hostname':
+                lines.append('hostname ' + fake.resolve(vm, 'guest.hostName'))
+            elif kind == 'name':
+                lines.append('name ' + fake.resolve(vm, 'name'))
+            else:
+                lines.append(fake.resolve(vm, 'guest.net')[0].macAddress)
+        for result in vsadmin.tools.batch.BatchResolver(vc).resolve(lines):
+            pass
+
+    def top(interval=20):
+        def run(vc):
+            collector = vsadmin.tools.top.TopCollector(vc, interval=interval)
+            vsadmin.tools.top.rank(collector.collect(collector.find_container('cluster', 'cluster1')), 'latency')
+        return run
+
+    def watch(vc):
+        # The first load and three refreshes of one QueryPerf each
+        vsadmin.tools.watch.watch(vc, vms[1:3], 0, ticks=4, stream=io.StringIO())
+
+    return [
+        ('vCenter.__init__', lambda vc: None),
+        ('search_vm_by_name', lambda vc: vc.search_vm_by_name(resolve('name'))),
+        ('search_vm_by_name contains', lambda vc: vc.search_vm_by_name('db-0', True, match='literal')),
+        ('search_vm_by_ip', lambda vc: vc.search_vm_by_ip(resolve('guest.ipAddress'))),
+        ('search_vm_by_ip custom fields', lambda vc: vc.search_vm_by_ip('192.0.2.1', True)),
+        ('search_vm_by_hostname', lambda vc: vc.search_vm_by_hostname(resolve('guest.hostName'))),
+        ('search_vm_by_mac', lambda vc: vc.search_vm_by_mac(resolve('guest.net')[0].macAddress)),
+        ('search_vm_by_task', lambda vc: vc.search_vm_by_task('TASK-000010', match='literal')),
+        ('print_vm_info', lambda vc: vc.print_vm_info(first)),
+        ('print_vm_info verbose', lambda vc: vc.print_vm_info(first, verbose=True)),
+        ('print_vms_info x{}'.format(report_vms), print_vms_info(False)),
+        ('print_vms_info x{} verbose'.format(report_vms), print_vms_info(True)),
+        ('print_vms_info x{} verbose 24h'.format(report_vms), print_vms_info(True, interval=1440)),
+        ('batch x{}'.format(batch_lines), batch),
+        ('top cluster', top()),
+        ('top cluster 24h', top(interval=1440)),
+        ('watch x2 4 ticks', watch),
+    ]
+
+
+def run_case(fake, func):
+    fake.stub.stats.reset()
+    started = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vc = fakevc.connect(fake)
+        func(vc)
+    result = fake.stub.stats.as_dict()
+    result['wall_ms'] = (time.time() - started) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vms', type=int, default=2000, help='number of synthetic virtual machines')
+    parser.add_argument('--disks', type=int, default=2, help='virtual disks per virtual machine')
+    parser.add_argument('--nics', type=int, default=1, help='network adapters per virtual machine')
+    parser.add_argument('--datastores', type=int, default=40, help='number of datastores')
+    parser.add_argument('--folders', type=int, default=100, help='number of folders')
+    parser.add_argument('--report-vms', type=int, default=50, help='virtual machines shown by print_vms_info')
+    parser.add_argument('--batch-lines', type=int, default=200, help='lines resolved by the batch case')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated milliseconds per round trip')
+    parser.add_argument('--only', metavar='TEXT', help='run only the cases whose name contains TEXT')
+    parser.add_argument('--json', metavar='FILE', help='write the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='fail if a case needs more round trips than in FILE')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the round trips per SOAP method')
+    args = parser.parse_args()
+
+    # Keep the session, perf counter and index caches out of the user's home
+    vsadmin.tools.cache.CACHE_DIR = tempfile.mkdtemp(prefix='vsadmin-bench-')
+
+    fake = fakevc.FakeVCenter(vms=args.vms, disks=args.disks, nics=args.nics, datastores=args.datastores,
+                              folders=args.folders, latency=args.latency / 1000.0)
+    results = {}
+    print('{:<34} {:>11} {:>12} {:>12} {:>10}'.format('case', 'round trips', 'sent', 'received', 'wall ms'))
+    for name, func in build_cases(fake, args.report_vms, args.batch_lines):
+        if args.only and args.only not in name:
+            continue
+        result = results[name] = run_case(fake, func)
+        print('{:<34} {:>11} {:>12} {:>12} {:>10.1f}'.format(name, result['round_trips'], result['bytes_sent'],
+                                                           result['bytes_received'], result['wall_ms']))
+        if args.verbose:
+            for method, count in sorted(result['calls'].items(), key=lambda item: -item[1]):
+                print('    {:<30} {:>11}'.format(method, count))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = [(name, baseline[name]['round_trips'], result['round_trips'])
+                       for name, result in results.items()
+                       if name in baseline and result['round_trips'] > baseline[name]['round_trips']]
+        for name, before, after in regressions:
+            print('REGRESSION: {} needs {} round trips instead of {}'.format(name, after, before), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
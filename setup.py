@@ -34,6 +34,7 @@ setup(
     entry_points={'console_scripts': ['vsadmin=vsadmin.cli:cli', ], },
     include_package_data=True,
     install_requires=requirements,
+    extras_require={'numpy': ['numpy']},
     keywords='vsadmin',
     license="MIT",
     classifiers=[
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import pytest
+import vsadmin.tools.cache
+from tests import fakevc
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Keep the session, perf counter and index caches out of the user's home"""
+    monkeypatch.setattr(vsadmin.tools.cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+@pytest.fixture
+def fake():
+    return fakevc.FakeVCenter(vms=20)
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+"""Offline stand-in for a vCenter, used by the tests and the benchmarks
+
+:class:`FakeVCenter` builds a synthetic inventory (virtual machines with
+disks and NICs, datastores, folders, hosts, clusters, perf counters and
+storage policies) and serves it through :class:`FakeStub`, a replacement of
+the pyVmomi SOAP stub adapter. Managed objects created on the fake stub
+behave like real ones: every property read and method call is one round
+trip, which is counted together with an estimate of the bytes on the wire
+and the time spent.
+"""
+import collections
+import datetime
+import itertools
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace as NS
+from pyVmomi import vim, vmodl
+from vsadmin.tools.tools import vCenter
+
+PERF_COUNTERS = ['mem.vmmemctl.average', 'mem.swapped.average',
+                 'virtualDisk.numberReadAveraged.average', 'virtualDisk.numberWriteAveraged.average',
+                 'virtualDisk.totalReadLatency.average', 'virtualDisk.totalWriteLatency.average',
+                 'datastore.numberReadAveraged.average', 'datastore.numberWriteAveraged.average',
+                 'datastore.totalReadLatency.average', 'datastore.totalWriteLatency.average',
+                 'cpu.usage.average', 'cpu.ready.summation', 'mem.usage.average',
+                 'net.usage.average', 'disk.usage.average']
+
+# Counters kept by the historical intervals, all of them at statistics level 1
+LEVEL_1_COUNTERS = {'mem.vmmemctl.average', 'cpu.usage.average', 'cpu.ready.summation', 'mem.usage.average',
+                    'net.usage.average', 'disk.usage.average'}
+
+LAST_NETWORK_INFO_KEY = 101
+
+# Rough size of the XML envelope of a SOAP request or response
+ENVELOPE_BYTES = 400
+
+
+def estimate_size(value, depth=0):
+    """Estimate the number of bytes a value takes in a SOAP message
+
+    :rtype: int
+    """
+    if value is None or depth > 20:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, datetime.datetime):
+        return 25
+    if isinstance(value, type):
+        return len(value.__name__)
+    if hasattr(value, '_moId'):
+        return len(value._moId) + 40
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item, depth + 1) for item in value)
+    if isinstance(value, vmodl.DynamicData):
+        items = [(prop.name, getattr(value, prop.name)) for prop in value._GetPropertyList()]
+    elif hasattr(value, '__dict__'):
+        items = vars(value).items()
+    else:
+        return len(str(value))
+    # Every field is an opening and a closing tag
+    return sum(2 * len(name) + 5 + estimate_size(item, depth + 1) for name, item in items)
+
+
+class CallStats(object):
+    """Round trips, estimated bytes and time spent per SOAP method"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = collections.Counter()
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.time = 0.0
+
+    def record(self, name, request, response, elapsed):
+        sent = ENVELOPE_BYTES + estimate_size(request)
+        received = ENVELOPE_BYTES + estimate_size(response)
+        with self.lock:
+            self.calls[name] += 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.time += elapsed
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def as_dict(self):
+        with self.lock:
+            return {'round_trips': sum(self.calls.values()),
+                    'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received,
+                    'calls': dict(self.calls)}
+
+
+class FakeStub(object):
+    """Replacement of the pyVmomi SOAP stub adapter serving a FakeVCenter
+
+    :param latency: Seconds to wait per round trip to simulate the network
+    :type latency: float
+    """
+
+    def __init__(self, latency=0.0):
+        self.host = 'vcenter.invalid:443'
+        self.cookie = 'vmware_soap_session="fake-session"; Path=/; HttpOnly'
+        self.poolSize = 1
+        self.latency = latency
+        self.props = {}
+        self.methods = {}
+        self.stats = CallStats()
+
+    def round_trip(self, name, request, func):
+        started = time.time()
+        if self.latency:
+            time.sleep(self.latency)
+        response = func()
+        self.stats.record(name, request, response, time.time() - started)
+        return response
+
+    def InvokeMethod(self, mo, info, args):
+        return self.round_trip(info.wsdlName, args, lambda: self.methods[info.wsdlName](mo, *args))
+
+    def InvokeAccessor(self, mo, info):
+        return self.round_trip('get:' + info.name, mo, lambda: self.props[mo._moId].get(info.name))
+
+
+class FakeProfileManager(object):
+    """Storage Policy (PBM) profile manager answering from the FakeVCenter"""
+
+    def __init__(self, vcenter):
+        self.vcenter = vcenter
+
+    def associated(self, ref):
+        return list(self.vcenter.policies.get(ref.key, []))
+
+    def PbmQueryAssociatedProfile(self, entity):
+        return self.vcenter.stub.round_trip('PbmQueryAssociatedProfile', entity,
+                                            lambda: self.associated(entity))
+
+    def PbmQueryAssociatedProfiles(self, entities):
+        return self.vcenter.stub.round_trip('PbmQueryAssociatedProfiles', entities,
+                                            lambda: [NS(object=ref, profileId=self.associated(ref), fault=None)
+                                                     for ref in entities])
+
+    def PbmRetrieveContent(self, profileIds):
+        return self.vcenter.stub.round_trip('PbmRetrieveContent', profileIds,
+                                            lambda: [self.vcenter.profiles[profileId.uniqueId]
+                                                     for profileId in profileIds])
+
+
+class FakeVsanPerformanceManager(object):
+    """vSAN performance manager answering VsanPerfQueryPerf with random samples"""
+
+    # The vSAN performance service keeps one sample every 5 minutes
+    SAMPLE_INTERVAL = 300
+
+    # Label and upper bound of the random samples (throughput in bytes/s, latency in µs)
+    LABELS = (('iopsRead', 500), ('iopsWrite', 500), ('throughputRead', 50 * 1024 * 1024),
+              ('throughputWrite', 50 * 1024 * 1024), ('latencyRead', 5000), ('latencyWrite', 5000),
+              ('readCongestion', 20), ('writeCongestion', 20))
+
+    def __init__(self, vcenter):
+        self.vcenter = vcenter
+
+    def entity_metric(self, spec):
+        rnd = self.vcenter.random
+        samples = max(1, int((spec.endTime - spec.startTime).total_seconds() // self.SAMPLE_INTERVAL))
+        timestamps = [spec.startTime + datetime.timedelta(seconds=self.SAMPLE_INTERVAL * (n + 1)) for n in range(samples)]
+        return NS(entityRefId=spec.entityRefId,
+                  sampleInfo=','.join(timestamp.strftime('%Y-%m-%d %H:%M:%S') for timestamp in timestamps),
+                  value=[NS(metricId=NS(label=label), values=','.join(str(rnd.randint(0, high)) for _ in range(samples)))
+                         for label, high in self.LABELS])
+
+    def VsanPerfQueryPerf(self, querySpecs, cluster=None):
+        return self.vcenter.stub.round_trip('VsanPerfQueryPerf', querySpecs,
+                                            lambda: [self.entity_metric(spec) for spec in querySpecs])
+
+
+class FakeVCenter(object):
+    """A synthetic vCenter inventory served over a FakeStub
+
+    :param vms: Number of virtual machines
+    :param disks: Number of virtual disks per virtual machine
+    :param nics: Number of network adapters per virtual machine
+    :param datastores: Number of datastores, every fourth one is vSAN
+    :param folders: Number of virtual machine folders
+    :param hosts: Number of ESXi hosts, spread over the clusters
+    :param clusters: Number of clusters
+    :param latency: Seconds to wait per round trip
+    :param seed: Seed of the random generator, the same seed gives the
+        same inventory
+    """
+
+    def __init__(self, vms=1000, disks=2, nics=1, datastores=20, folders=50, hosts=16, clusters=2,
+                 latency=0.0, seed=0):
+        self.random = random.Random(seed)
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        self.stub = FakeStub(latency)
+        self.entities = []
+        self.views = {}
+        self.results = {}
+        self.collectors = {}
+        self.ids = itertools.count(1)
+        self.policies = {}
+        self.profiles = {}
+        self.profile_manager = FakeProfileManager(self)
+        self.vsan_performance_manager = FakeVsanPerformanceManager(self)
+
+        self.build_content()
+        self.build_profiles()
+        self.build_datastores(datastores)
+        self.build_folders(folders)
+        self.build_hosts(hosts, clusters)
+        self.vms = [self.build_vm(i, disks, nics) for i in range(vms)]
+        self.register_methods()
+        self.service_instance = vim.ServiceInstance('ServiceInstance', self.stub)
+
+    def mo(self, cls, moId, **props):
+        obj = cls(moId, self.stub)
+        self.stub.props[moId] = props
+        self.entities.append(obj)
+        return obj
+
+    def build_content(self):
+        counters = [NS(key=key, groupInfo=NS(key=name.split('.')[0]), nameInfo=NS(key=name.split('.')[1]),
+                       rollupType=name.split('.')[2])
+                    for key, name in enumerate(PERF_COUNTERS, 1)]
+        self.perf_manager = vim.PerformanceManager('PerfMgr', self.stub)
+        self.stub.props['PerfMgr'] = {
+            'perfCounter': counters,
+            'historicalInterval': [NS(key=1, samplingPeriod=300, length=86400, level=1, enabled=True),
+                                   NS(key=2, samplingPeriod=1800, length=604800, level=1, enabled=True),
+                                   NS(key=3, samplingPeriod=7200, length=2592000, level=1, enabled=True),
+                                   NS(key=4, samplingPeriod=86400, length=31536000, level=1, enabled=True)]}
+        self.root_folder = self.mo(vim.Folder, 'group-d1', name='Datacenters', parent=None)
+        self.datacenter = self.mo(vim.Datacenter, 'datacenter-1', name='DC1', parent=self.root_folder)
+        self.vm_folder = self.mo(vim.Folder, 'group-v1', name='vm', parent=self.datacenter)
+        self.content = NS(rootFolder=self.root_folder,
+                          propertyCollector=vmodl.query.PropertyCollector('propertyCollector', self.stub),
+                          viewManager=vim.view.ViewManager('ViewManager', self.stub),
+                          searchIndex=vim.SearchIndex('SearchIndex', self.stub),
+                          perfManager=self.perf_manager,
+                          setting=vim.option.OptionManager('VpxSettings', self.stub),
+                          customFieldsManager=NS(field=[NS(name='LastNetworkInfo', key=LAST_NETWORK_INFO_KEY)]),
+                          about=NS(instanceUuid='00000000-0000-0000-0000-000000000001', build='12345',
+                                   version='7.0.3', apiVersion='7.0.3.0'),
+                          sessionManager=vim.SessionManager('SessionManager', self.stub))
+        self.stub.props['ServiceInstance'] = {'content': self.content}
+        self.stub.props['SessionManager'] = {'currentSession': NS(key='fake-session', userName='benchmark')}
+
+    def build_profiles(self):
+        for i, name in enumerate(['vSAN Default Storage Policy', 'RAID-5', 'RAID-1 FTT=2']):
+            uniqueId = 'profile-{}'.format(i)
+            constraint = NS(propertyInstance=[NS(id='hostFailuresToTolerate', value=i + 1),
+                                              NS(id='stripeWidth', value=1)])
+            self.profiles[uniqueId] = NS(profileId=NS(uniqueId=uniqueId), name=name,
+                                         description='{} (synthetic)'.format(name),
+                                         constraints=NS(subProfiles=[NS(capability=[NS(constraint=[constraint])])]))
+
+    def build_datastores(self, count):
+        self.datastores = []
+        for i in range(count):
+            moId = 'datastore-{}'.format(i + 1)
+            if i % 4 == 0:
+                summary = NS(type='vsan', url='ds:///vmfs/volumes/vsan:{:032x}/'.format(i))
+                info = NS()
+            elif i % 4 == 3:
+                summary = NS(type='NFS', url='ds:///vmfs/volumes/{:08x}-{:08x}/'.format(i, i))
+                info = NS(nas=NS(remoteHost='nfs.invalid'))
+            else:
+                uuid = '{:08x}-{:08x}-{:04x}-{:012x}'.format(i, i, i, i)
+                summary = NS(type='VMFS', url='ds:///vmfs/volumes/{}/'.format(uuid))
+                info = NS(vmfs=NS(uuid=uuid))
+            self.datastores.append(self.mo(vim.Datastore, moId, name='ds{:03d}'.format(i), summary=summary, info=info))
+
+    def build_folders(self, count):
+        self.folders = [self.vm_folder]
+        for i in range(count):
+            parent = self.random.choice(self.folders)
+            self.folders.append(self.mo(vim.Folder, 'group-v{}'.format(i + 2), name='folder{:03d}'.format(i),
+                                        parent=parent))
+
+    def build_hosts(self, count, clusters):
+        self.clusters = [self.mo(vim.ClusterComputeResource, 'domain-c{}'.format(i + 1), name='cluster{}'.format(i + 1),
+                                 parent=self.datacenter)
+                         for i in range(clusters)]
+        self.hosts = [self.mo(vim.HostSystem, 'host-{}'.format(i + 1), name='esx{:02d}.invalid'.format(i + 1),
+                              parent=self.clusters[i % clusters])
+                      for i in range(count)]
+
+    def build_vm(self, i, disk_count, nic_count):
+        rnd = self.random
+        moId = 'vm-{}'.format(i + 1)
+        name = '{}-{:05d}'.format(rnd.choice(['web', 'db', 'app', 'cache']), i)
+        datastore = rnd.choice(self.datastores)
+        devices = [NS(key=1000, busNumber=0)]
+        for d in range(disk_count):
+            disk_datastore = rnd.choice(self.datastores)
+            devices.append(NS(key=2000 + d, controllerKey=1000, unitNumber=d,
+                              capacityInKB=rnd.choice([20, 40, 100]) * 1024 * 1024,
+                              deviceInfo=NS(label='Hard disk {}'.format(d + 1)),
+                              backing=NS(datastore=disk_datastore, thinProvisioned=rnd.random() < 0.7,
+                                         fileName='[{}] {}/{}_{}.vmdk'.format(self.stub.props[disk_datastore._moId]['name'],
+                                                                             name, name, d))))
+            if self.stub.props[disk_datastore._moId]['summary'].type == 'vsan':
+                self.policies['{}:{}'.format(moId, 2000 + d)] = [NS(uniqueId='profile-{}'.format(rnd.randint(0, 2)))]
+        nets = []
+        for n in range(nic_count):
+            mac = '00:50:56:{:02x}:{:02x}:{:02x}'.format((i >> 16) & 0xff, (i >> 8) & 0xff, (i + n * 7919) & 0xff)
+            ip = '10.{}.{}.{}'.format(n, (i >> 8) & 0xff, i & 0xff)
+            devices.append(NS(key=4000 + n, macAddress=mac, connectable=NS(connected=True)))
+            nets.append(NS(network='VM Network {}'.format(n), deviceConfigId=4000 + n, macAddress=mac,
+                           connected=True, ipAddress=[ip], ipConfig=NS(ipAddress=[NS(ipAddress=ip, prefixLength=24)])))
+        powered_on = rnd.random() < 0.9
+        vmx_datastore_name = self.stub.props[datastore._moId]['name']
+        if self.stub.props[datastore._moId]['summary'].type == 'vsan':
+            self.policies[moId] = [NS(uniqueId='profile-0')]
+        annotation = 'Owner: team{}\n'.format(i % 17) + ' '.join(rnd.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet'])
+                                                                  for _ in range(rnd.randint(0, 200)))
+        if i % 10 == 0:
+            annotation += '\nTASK-{:06d}'.format(i)
+        hostname = '{}.example.invalid'.format(name)
+        runtime = NS(powerState='poweredOn' if powered_on else 'poweredOff', host=rnd.choice(self.hosts), question=None)
+        summary = NS(runtime=runtime,
+                     config=NS(name=name, instanceUuid='{:08x}-0000-0000-0000-{:012x}'.format(i, i), guestFullName='Linux',
+                               numCpu=rnd.choice([1, 2, 4, 8]), memorySizeMB=rnd.choice([1024, 2048, 4096, 8192]),
+                               vmPathName='[{}] {}/{}.vmx'.format(vmx_datastore_name, name, name),
+                               annotation=annotation))
+        guest = NS(toolsRunningStatus='guestToolsRunning' if powered_on else 'guestToolsNotRunning',
+                   toolsStatus='toolsOk', toolsVersionStatus='guestToolsCurrent', toolsVersion='12345',
+                   hostName=hostname, ipAddress=nets[0].ipAddress[0] if nets else None, net=nets,
+                   ipStack=[NS(ipRouteConfig=NS(ipRoute=[NS(network='0.0.0.0', gateway=NS(ipAddress='10.0.0.1'))]),
+                               dnsConfig=NS(hostName=name, ipAddress=['10.0.0.53'], domainName='example.invalid'))])
+        customValue = [NS(key=LAST_NETWORK_INFO_KEY, value=nets[0].ipAddress[0] if nets else '')]
+        return self.mo(vim.VirtualMachine, moId, name=name, parent=rnd.choice(self.folders), summary=summary,
+                       runtime=runtime, guest=guest, customValue=customValue,
+                       config=NS(name=name, annotation=annotation, instanceUuid=summary.config.instanceUuid,
+                                 hardware=NS(device=devices)))
+
+    def resolve(self, obj, path):
+        parts = path.split('.')
+        value = self.stub.props[obj._moId].get(parts[0])
+        for part in parts[1:]:
+            value = getattr(value, part, None)
+        return value
+
+    def contains(self, container, obj):
+        """Whether obj is below container, through its folders or its host and cluster"""
+        if container is None or container._moId == self.root_folder._moId:
+            return True
+        parents = []
+        host = self.resolve(obj, 'runtime.host')
+        if host is not None:
+            parents.extend([host, self.resolve(host, 'parent')])
+        parent = self.resolve(obj, 'parent')
+        while parent is not None:
+            parents.append(parent)
+            parent = self.resolve(parent, 'parent')
+        return any(parent._moId == container._moId for parent in parents)
+
+    def instances(self, entity, metric):
+        """Expand the "*" instance of a QueryPerf metric like vCenter does"""
+        if metric.instance != '*':
+            return [metric.instance]
+        if PERF_COUNTERS[metric.counterId - 1].startswith('virtualDisk.'):
+            devices = self.resolve(entity, 'config.hardware.device')
+            return ['scsi0:{}'.format(device.unitNumber) for device in devices if 2000 <= device.key < 3000]
+        return ['']
+
+    def object_content(self, obj, path_set):
+        prop_set = []
+        for path in path_set:
+            value = self.resolve(obj, path)
+            if value is not None:
+                prop_set.append(NS(name=path, val=value))
+        return NS(obj=obj, propSet=prop_set)
+
+    def filter_objects(self, spec):
+        objs = []
+        for obj_spec in spec.objectSet:
+            if obj_spec.selectSet:
+                objs.extend(self.views[obj_spec.obj._moId])
+            if not obj_spec.skip:
+                objs.append(obj_spec.obj)
+        return objs
+
+    def register_methods(self):
+        methods = self.stub.methods
+
+        def create_container_view(mo, container, types, recursive):
+            view = vim.view.ContainerView('session[fake]view-{}'.format(next(self.ids)), self.stub)
+            self.views[view._moId] = [obj for obj in self.entities
+                                      if isinstance(obj, tuple(types)) and self.contains(container, obj)]
+            return view
+
+        def destroy_view(mo):
+            self.views.pop(mo._moId, None)
+
+        def page(objects, page_size):
+            token = None
+            if page_size and len(objects) > page_size:
+                token = 'token-{}'.format(next(self.ids))
+                self.results[token] = (objects[page_size:], page_size)
+                objects = objects[:page_size]
+            return NS(token=token, objects=objects)
+
+        def retrieve_properties_ex(mo, specs, options):
+            objects = []
+            for spec in specs:
+                path_set = spec.propSet[0].pathSet
+                objects.extend(self.object_content(obj, path_set) for obj in self.filter_objects(spec))
+            return page(objects, options.maxObjects if options is not None else None)
+
+        def continue_retrieve_properties_ex(mo, token):
+            objects, page_size = self.results.pop(token)
+            return page(objects, page_size)
+
+        def cancel_retrieve_properties_ex(mo, token):
+            self.results.pop(token, None)
+
+        def create_property_collector(mo):
+            collector = vmodl.query.PropertyCollector('session[fake]collector-{}'.format(next(self.ids)), self.stub)
+            self.collectors[collector._moId] = {'filters': [], 'version': None}
+            return collector
+
+        def create_filter(mo, spec, partialUpdates):
+            self.collectors[mo._moId]['filters'].append(spec)
+
+        def wait_for_updates_ex(mo, version, options):
+            if mo._moId not in self.collectors:
+                raise vmodl.fault.ManagedObjectNotFound(obj=mo)
+            collector = self.collectors[mo._moId]
+            if version:
+                # The synthetic inventory never changes
+                return None
+            object_set = []
+            for spec in collector['filters']:
+                path_set = spec.propSet[0].pathSet
+                for obj in self.filter_objects(spec):
+                    object_set.append(NS(obj=obj, kind='enter',
+                                         changeSet=[NS(name=path, op='assign', val=self.resolve(obj, path))
+                                                    for path in path_set]))
+            return NS(version='1', truncated=False, filterSet=[NS(objectSet=object_set)])
+
+        def query_perf(mo, querySpec):
+            result = []
+            for spec in querySpec:
+                period = spec.intervalId or 20
+                end = spec.endTime or self.now
+                # Samples are taken on the period boundaries, after startTime
+                last = end - datetime.timedelta(seconds=end.timestamp() % period)
+                samples = max(0, int(math.ceil((last - spec.startTime).total_seconds() / period)))
+                if spec.maxSample:
+                    samples = min(samples, spec.maxSample)
+                result.append(NS(entity=spec.entity,
+                                 sampleInfo=[NS(timestamp=last - datetime.timedelta(seconds=period * n),
+                                                interval=period) for n in reversed(range(samples))],
+                                 value=[NS(id=NS(counterId=metric.counterId, instance=instance),
+                                           value=[self.random.randint(0, 50) for _ in range(samples)])
+                                        for metric in spec.metricId
+                                        if period == 20 or PERF_COUNTERS[metric.counterId - 1] in LEVEL_1_COUNTERS
+                                        for instance in self.instances(spec.entity, metric)]))
+            return result
+
+        def query_options(mo, name):
+            if name != 'config.vpxd.stats.maxQueryMetrics':
+                raise vim.fault.InvalidName(name=name)
+            return [NS(key=name, value=64)]
+
+        def find_by_ip(mo, datacenter, ip, vmSearch):
+            return next((vm for vm in self.vms if self.resolve(vm, 'guest.ipAddress') == ip), None)
+
+        def find_by_dns_name(mo, datacenter, dnsName, vmSearch):
+            return next((vm for vm in self.vms if self.resolve(vm, 'guest.hostName') == dnsName), None)
+
+        methods['RetrieveServiceContent'] = lambda mo: self.content
+        methods['Login'] = lambda mo, userName, password, locale: self.stub.props['SessionManager']['currentSession']
+        methods['CurrentTime'] = lambda mo: self.now
+        methods['CreateContainerView'] = create_container_view
+        methods['DestroyView'] = destroy_view
+        methods['RetrievePropertiesEx'] = retrieve_properties_ex
+        methods['ContinueRetrievePropertiesEx'] = continue_retrieve_properties_ex
+        methods['CancelRetrievePropertiesEx'] = cancel_retrieve_properties_ex
+        methods['CreatePropertyCollector'] = create_property_collector
+        methods['CreateFilter'] = create_filter
+        methods['WaitForUpdatesEx'] = wait_for_updates_ex
+        methods['QueryPerf'] = query_perf
+        methods['QueryOptions'] = query_options
+        methods['FindByIp'] = find_by_ip
+        methods['FindByDnsName'] = find_by_dns_name
+
+
+def connect(fake):
+    """Return a vCenter connected to a FakeVCenter, without any lazily loaded state
+
+    :param fake: The fake vCenter
+    :type fake: FakeVCenter
+    :rtype: vsadmin.tools.tools.vCenter
+    """
+    vc = vCenter(fake.stub.host.split(':')[0], 'benchmark', None, True, service_instance=fake.service_instance)
+    vc.__dict__['pm'] = fake.profile_manager
+    vc.__dict__['vsanPerfSystem'] = fake.vsan_performance_manager
+    return vc
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import pytest
+import vsadmin.tools.batch
+from tests import fakevc
+
+
+@pytest.mark.parametrize('line, entry', [
+    ('', None),
+    ('# comment', None),
+    ('192.0.2.1', ('ip', '192.0.2.1')),
+    ('00:50:56:ab:cd:ef', ('mac', '00:50:56:ab:cd:ef')),
+    ('00-50-56-AB-CD-EF', ('mac', '00-50-56-AB-CD-EF')),
+    ('deadbeefcafe', ('mac', 'deadbeefcafe')),
+    ('00:50:56', ('name', '00:50:56')),
+    ('web01.example.com', ('hostname', 'web01.example.com')),
+    ('web01', ('name', 'web01')),
+    ('  name web 01  ', ('name', 'web 01')),
+    ('TASK SD-1234', ('task', 'SD-1234')),
+])
+def test_parse_line(line, entry):
+    assert vsadmin.tools.batch.parse_line(line) == entry
+
+
+def test_bare_hex_falls_back_to_name(fake, cache_dir):
+    fake.stub.props[fake.vms[5]._moId]['name'] = 'deadbeefcafe'
+    resolver = vsadmin.tools.batch.BatchResolver(fakevc.connect(fake))
+    results = list(resolver.resolve(['deadbeefcafe', '00:00:de:ad:be:ef']))
+    assert [(result['kind'], result['found']) for result in results] == [('name', True), ('mac', False)]
+    assert results[0]['vms'] == [{'moref': fake.vms[5]._moId, 'name': 'deadbeefcafe'}]
+
+
+def test_resolve_streams_the_lines(fake, cache_dir, monkeypatch):
+    def lines():
+        yield fake.resolve(fake.vms[0], 'name')
+        raise AssertionError('read past the first chunk')
+    monkeypatch.setattr(vsadmin.tools.batch, 'CHUNK_SIZE', 1)
+    resolver = vsadmin.tools.batch.BatchResolver(fakevc.connect(fake))
+    assert next(resolver.resolve(lines()))['found']
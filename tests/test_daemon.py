@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Run searches through a forked vsadmin daemon serving the fake vCenter"""
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import time
+import pytest
+import vsadmin.cli
+import vsadmin.tools.daemon
+from vsadmin.commands.cmd_search import search
+from tests import fakevc
+
+SERVER = 'vcenter.invalid'
+USERNAME = 'benchmark'
+
+
+def serve(socket_path, fake):
+    vc = fakevc.connect(fake)
+    ctx = vsadmin.cli.Context()
+    ctx.profile = False
+
+    def handle_search(**options):
+        vc.reset_request_state()
+        search(ctx, vc, **options)
+
+    server = vsadmin.tools.daemon.DaemonServer(socket_path, SERVER, USERNAME, {'search': handle_search})
+    server.serve_forever()
+
+
+@pytest.fixture
+def daemon(fake, cache_dir):
+    # Unix socket paths are limited to about 100 characters
+    directory = tempfile.mkdtemp(prefix='vsadmin-')
+    socket_path = os.path.join(directory, 'vsadmin.sock')
+    # The daemon redirects sys.stdout, it cannot share the process of the client
+    process = multiprocessing.get_context('fork').Process(target=serve, args=(socket_path, fake), daemon=True)
+    process.start()
+    for _ in range(200):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.05)
+    yield socket_path, fake
+    process.terminate()
+    process.join()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def options(**kwargs):
+    result = dict(name=None, contains=False, mac=[], ip=None, custom_fields=False, hostname=None, task=None,
+                  match='regex', verbose=False, interval=20, jobs=1, output='text', batch=None, watch=None)
+    result.update(kwargs)
+    return result
+
+
+def test_not_found(daemon, capsys):
+    socket_path, fake = daemon
+    exit_code = vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME, options(name='missing'))
+    assert exit_code == 1
+    assert capsys.readouterr().out == 'There is no VM found.\n'
+
+
+def test_not_found_json_goes_to_stderr(daemon, capsys):
+    socket_path, fake = daemon
+    exit_code = vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME,
+                                             options(name='missing', output='json'))
+    assert exit_code == 1
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert captured.err == 'There is no VM found.\n'
+
+
+def test_verbose(daemon, capsys):
+    socket_path, fake = daemon
+    vm = next(vm for vm in fake.vms if fake.resolve(vm, 'summary.runtime.powerState') == 'poweredOn')
+    name = fake.resolve(vm, 'name')
+    exit_code = vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME,
+                                             options(name=name, verbose=True))
+    assert exit_code == 0
+    captured = capsys.readouterr()
+    assert name in captured.out
+    assert 'QueryPerf call(s)' in captured.err
+
+
+def test_batch_verbose(daemon, capsys):
+    socket_path, fake = daemon
+    ip = fake.resolve(fake.vms[0], 'guest.ipAddress')
+    exit_code = vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME,
+                                             options(batch=[ip, '192.0.2.254'], verbose=True))
+    assert exit_code == 1
+    captured = capsys.readouterr()
+    assert fake.resolve(fake.vms[0], 'name') in captured.out
+    assert 'lookups/s' in captured.err
+
+
+def test_declined(daemon):
+    socket_path, fake = daemon
+    assert vsadmin.tools.daemon.request(socket_path, 'search', 'other.invalid', USERNAME, options(name='x')) is None
+
+
+def test_refuses_running_daemon(daemon):
+    socket_path, fake = daemon
+    with pytest.raises(SystemExit):
+        vsadmin.tools.daemon.DaemonServer(socket_path, SERVER, USERNAME, {})
+    assert vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME, options(name='missing')) == 1
+
+
+@pytest.fixture
+def socket_dir():
+    directory = tempfile.mkdtemp(prefix='vsadmin-')
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_replaces_stale_socket(socket_dir):
+    socket_path = os.path.join(socket_dir, 'vsadmin.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = vsadmin.tools.daemon.DaemonServer(socket_path, SERVER, USERNAME, {})
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_hung_daemon_times_out(socket_dir, capsys):
+    socket_path = os.path.join(socket_dir, 'vsadmin.sock')
+    hung = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    hung.bind(socket_path)
+    hung.listen(1)
+    try:
+        started = time.time()
+        assert vsadmin.tools.daemon.request(socket_path, 'search', SERVER, USERNAME, options(name='x'),
+                                            timeout=0.2) is None
+        assert time.time() - started < 2
+    finally:
+        hung.close()
+    assert 'did not answer' in capsys.readouterr().err
+
+
+def test_request_state_keeps_inventory_warm(fake, cache_dir):
+    vc = fakevc.connect(fake)
+    mac = next(device.macAddress for device in fake.resolve(fake.vms[3], 'config.hardware.device')
+               if getattr(device, 'macAddress', None))
+    assert vc.search_vm_by_mac(mac) == [fake.vms[3]]
+    vc.reset_request_state()
+    fake.stub.stats.reset()
+    assert vc.search_vm_by_mac(mac) == [fake.vms[3]]
+    assert fake.stub.stats.as_dict()['round_trips'] == 0
+    # A miss reloads the MAC index once per request
+    assert vc.search_vm_by_mac('00:11:22:33:44:55') == []
+    assert fake.stub.stats.as_dict()['calls']['RetrievePropertiesEx'] == 1
+    assert vc.search_vm_by_mac('00:11:22:33:44:56') == []
+    assert fake.stub.stats.as_dict()['calls']['RetrievePropertiesEx'] == 1
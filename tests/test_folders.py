@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from pyVmomi import vim
+from tests import fakevc
+
+
+def expected_path(fake, folder):
+    names = []
+    while fake.resolve(folder, 'name') != 'vm':
+        names.insert(0, fake.resolve(folder, 'name'))
+        folder = fake.resolve(folder, 'parent')
+    return '/' + '/'.join(names)
+
+
+def test_folder_paths_share_one_retrieve(fake, cache_dir):
+    vc = fakevc.connect(fake)
+    for vm in fake.vms:
+        folder = fake.resolve(vm, 'parent')
+        assert vc.get_folder_path(folder) == expected_path(fake, folder)
+    # The folder tree is loaded once for all the virtual machines
+    assert fake.stub.stats.as_dict()['calls']['RetrievePropertiesEx'] == 1
+
+
+def test_folder_created_later_reloads_the_tree(fake, cache_dir):
+    vc = fakevc.connect(fake)
+    vc.get_folder_path(fake.resolve(fake.vms[0], 'parent'))
+    folder = fake.mo(vim.Folder, 'group-v-new', name='new', parent=fake.vm_folder)
+    assert vc.get_folder_path(folder) == '/new'
+    assert fake.stub.stats.as_dict()['calls']['RetrievePropertiesEx'] == 2
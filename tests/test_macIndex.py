@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace as NS
+import pytest
+from vsadmin.tools.macIndex import MacIndex, is_prefix, normalize_mac
+
+
+@pytest.mark.parametrize('mac, expected', [
+    ('00:50:56:ab:cd:ef', '00:50:56:ab:cd:ef'),
+    ('00-50-56-AB-CD-EF', '00:50:56:ab:cd:ef'),
+    ('0050.56ab.cdef', '00:50:56:ab:cd:ef'),
+    (' 005056abcdef ', '00:50:56:ab:cd:ef'),
+    ('00:50:56', '00:50:56'),
+    ('', None),
+    ('00:50:5', None),
+    ('00:50:56:ab:cd:ef:01', None),
+    ('00:50:56:zz:cd:ef', None),
+])
+def test_normalize_mac(mac, expected):
+    assert normalize_mac(mac) == expected
+
+
+def test_is_prefix():
+    assert is_prefix('00:50:56')
+    assert not is_prefix('00:50:56:ab:cd:ef')
+
+
+def record(obj, *macs):
+    devices = [NS(key=4000 + i, macAddress=mac) for i, mac in enumerate(macs)]
+    # Not a network adapter
+    devices.append(NS(key=2000, macAddress=None))
+    return {'obj': obj, 'config.hardware.device': devices}
+
+
+def test_mac_index():
+    index = MacIndex.from_records([record('vm-1', '00:50:56:AB:CD:01', '00:50:56:ab:cd:02'),
+                                   record('vm-2', '00:50:56:ab:ce:01'),
+                                   record('vm-3', '00:0c:29:00:00:01'),
+                                   {'obj': 'vm-4', 'config.hardware.device': None}])
+    assert index.find('00:50:56:ab:cd:01') == ['vm-1']
+    assert index.find('00:50:56:ab:cd') == ['vm-1']
+    assert index.find('00:50:56') == ['vm-1', 'vm-2']
+    assert index.find('00:0c:29:00:00:02') == []
+    assert index.find('ff') == []
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import re
+import pytest
+from vsadmin.tools.matcher import compile_matcher
+
+
+@pytest.mark.parametrize('pattern, mode, text, expected', [
+    ('web', 'literal', 'prod-WEB-01', True),
+    ('web.*', 'literal', 'prod-web-01', False),
+    ('a.b', 'literal', 'a.b', True),
+    ('prod-*', 'glob', 'PROD-web-01', True),
+    ('web*', 'glob', 'prod-web-01', False),
+    ('db-0?', 'glob', 'db-01', True),
+    ('db-[12]', 'glob', 'db-3', False),
+    ('web-\\d+', 'regex', 'prod-web-01', True),
+    ('^web', 'regex', 'prod-web-01', False),
+    ('WEB', 'regex', 'prod-web-01', False),
+])
+def test_match_modes(pattern, mode, text, expected):
+    assert compile_matcher(pattern, mode)(text) is expected
+
+
+@pytest.mark.parametrize('mode', ['literal', 'glob', 'regex'])
+def test_empty_texts_never_match(mode):
+    matches = compile_matcher('*' if mode == 'glob' else '', mode)
+    assert not matches(None)
+    assert not matches('')
+
+
+def test_compiled_once():
+    assert compile_matcher('web', 'regex') is compile_matcher('web', 'regex')
+
+
+def test_invalid_patterns():
+    with pytest.raises(re.error):
+        compile_matcher('[', 'regex')
+    with pytest.raises(ValueError):
+        compile_matcher('web', 'fuzzy')
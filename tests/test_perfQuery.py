@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace as NS
+import pytest
+from vsadmin.tools.perfQuery import plan_interval
+
+DAY = NS(samplingPeriod=300, length=86400, enabled=True)
+WEEK = NS(samplingPeriod=1800, length=7 * 86400, enabled=True)
+MONTH = NS(samplingPeriod=7200, length=30 * 86400, enabled=True)
+YEAR = NS(samplingPeriod=86400, length=365 * 86400, enabled=True)
+INTERVALS = [DAY, WEEK, MONTH, YEAR]
+
+
+@pytest.mark.parametrize('window, expected', [
+    (60, (20, 3)),
+    (20 * 60, (20, 60)),
+    (3600, (20, 180)),
+    (3601, (300, None)),
+    (86400, (300, None)),
+    (2 * 86400, (1800, None)),
+    (400 * 86400, (86400, None)),
+])
+def test_plan_interval(window, expected):
+    assert plan_interval(window, INTERVALS) == expected
+
+
+def test_plan_interval_skips_disabled_intervals():
+    disabled_day = NS(samplingPeriod=300, length=86400, enabled=False)
+    assert plan_interval(86400, [disabled_day, WEEK]) == (1800, None)
+
+
+def test_plan_interval_without_historical_intervals():
+    assert plan_interval(86400) == (20, 4320)
+    assert plan_interval(86400, [NS(samplingPeriod=300, length=86400, enabled=False)]) == (20, 4320)
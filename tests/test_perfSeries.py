@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import datetime
+import random
+from types import SimpleNamespace as NS
+import pytest
+import vsadmin.tools.perfSeries
+from vsadmin.tools.perfSeries import MISSING, SeriesTable
+
+
+def build_table():
+    table = SeriesTable()
+    table.add('a', [0, 20, 40, 60], [10, 20, 30, 40])
+    table.add('b', [0, 20, 40, 60], [MISSING, 5, MISSING, 15])
+    table.add('empty', [0, 20], [MISSING, MISSING])
+    table.add('single', [0], [7])
+    return table
+
+
+def test_reductions():
+    table = build_table()
+    assert table.mean('a') == 25
+    assert table.max('a') == 40
+    assert table.p95('a') == 40
+    # Totals per 20 seconds sampling period
+    assert table.rate('a') == 25 / 20.0
+
+
+def test_missing_samples_are_left_out():
+    table = build_table()
+    assert list(table.samples('b')) == [5, 15]
+    assert list(table.sample_times('b')) == [20, 60]
+    assert table.mean('b') == 10
+    assert table.last_timestamp('b') == 60
+    for how in ('mean', 'max', 'p95', 'rate'):
+        assert getattr(table, how)('empty') is None
+
+
+def test_rate_needs_the_sampling_period():
+    table = build_table()
+    assert table.mean('single') == 7
+    assert table.rate('single') is None
+
+
+def test_add_replaces_a_series():
+    table = build_table()
+    table.add('a', [0], [1])
+    assert list(table.samples('a')) == [1]
+    assert len(table) == 4
+
+
+def test_from_entity_metrics():
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    sample_info = [NS(timestamp=start + datetime.timedelta(seconds=300 * n), interval=300) for n in range(3)]
+    entity = NS(_moId='vm-1')
+    result = [NS(entity=entity, sampleInfo=sample_info,
+                 value=[NS(id=NS(counterId=6, instance=''), value=[3000, MISSING, 6000])])]
+    table = SeriesTable.from_entity_metrics(result, lambda entity, counter_id, instance: (entity._moId, counter_id))
+    assert table.rate(('vm-1', 6)) == 4500 / 300.0
+    assert list(table.sample_times(('vm-1', 6))) == [start.timestamp(), start.timestamp() + 600]
+
+
+@pytest.mark.parametrize('how', vsadmin.tools.perfSeries.REDUCTIONS)
+def test_numpy_and_pure_python_agree(how, monkeypatch):
+    pytest.importorskip('numpy')
+    rnd = random.Random(0)
+    table = SeriesTable()
+    for key in range(50):
+        length = rnd.choice([0, 1, 3, 15, 16])
+        table.add(key, [20 * n for n in range(length)],
+                  [rnd.choice([MISSING, rnd.randint(0, 1000)]) for _ in range(length)])
+    keys = [key for key in table.keys() if key % 3] + ['unknown']
+    vectorized = table.reduce(how, keys)
+    monkeypatch.setattr(vsadmin.tools.perfSeries, 'load_numpy', lambda: None)
+    pure = table.reduce(how, keys)
+    for key in keys:
+        expected = getattr(table, how)(key)
+        assert vectorized[key] == pytest.approx(expected)
+        assert pure[key] == pytest.approx(expected)
+
+
+def test_unknown_reduction():
+    with pytest.raises(ValueError):
+        build_table().reduce('median')
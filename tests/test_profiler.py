@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import pyVim.connect
+import pytest
+import vsadmin.tools.profiler
+from vsadmin.tools.tools import vCenter
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(vsadmin.tools.profiler, 'PROFILER', None)
+    return vsadmin.tools.profiler.start()
+
+
+def recorded_methods(profiler):
+    return [event['method'] for event in profiler.events]
+
+
+def test_login_and_resumed_session_are_recorded(fake, cache_dir, profiler, monkeypatch):
+    monkeypatch.setattr(pyVim.connect, 'SmartStubAdapter', lambda **kwargs: fake.stub)
+    vCenter('vcenter.invalid', 'benchmark', 'secret', True, session_cache=True)
+    assert recorded_methods(profiler) == ['RetrieveServiceContent', 'Login']
+    del profiler.events[:]
+    # The session saved by the login is resumed
+    vCenter('vcenter.invalid', 'benchmark', 'secret', True, session_cache=True)
+    assert recorded_methods(profiler) == ['RetrieveServiceContent', 'get currentSession']
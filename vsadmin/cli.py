@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import atexit
+import importlib
 import os
 import click
+import vsadmin.tools.daemon
+import vsadmin.tools.profiler
 
 CONTEXT_SETTINGS = dict(auto_envvar_prefix='VSADMIN')
 
@@ -28,6 +32,8 @@ cmd_folder = os.path.abspath(os.path.join(os.path.dirname(__file__),
 
 class ComplexCLI(click.MultiCommand):
 
+    commands = {}
+
     def list_commands(self, ctx):
         rv = []
         for filename in os.listdir(cmd_folder):
@@ -38,12 +44,13 @@ class ComplexCLI(click.MultiCommand):
         return rv
 
     def get_command(self, ctx, name):
-        ns = {}
-        fn = os.path.join(cmd_folder, 'cmd_' + name + '.py')
-        with open(fn) as f:
-            code = compile(f.read(), fn, 'exec')
-            eval(code, ns, ns)
-        return ns['cli']
+        if name not in self.commands:
+            if name not in self.list_commands(ctx):
+                return None
+            # A regular import, so the module is compiled once to __pycache__
+            module = importlib.import_module('vsadmin.commands.cmd_' + name)
+            self.commands[name] = module.cli
+        return self.commands[name]
 
 
 @click.command(cls=ComplexCLI, context_settings=CONTEXT_SETTINGS)
@@ -58,11 +65,38 @@ class ComplexCLI(click.MultiCommand):
               help='vCenter address.')
 @click.option('--disable-ssl-verification', is_flag=True, default=True,
               show_default=True, help='Disable SSL verification.')
+@click.option('--session-cache', is_flag=True, default=False,
+              help='Reuse the vSphere session between runs instead of logging in every time.')
+@click.option('--index', 'use_index', is_flag=True, default=False,
+              help='Answer searches from a local inventory index that is refreshed incrementally.')
+@click.option('--socket', metavar='<Path>',
+              default=lambda: vsadmin.tools.daemon.get_socket_path(),
+              help='Unix domain socket of the vsadmin daemon (vsadmin serve).')
+@click.option('--debug', is_flag=True, default=False,
+              help='Print which vCenter services were initialized by the command.')
+@click.option('--profile', is_flag=True, default=False,
+              help='Print the SOAP calls made by the command, their size and latency on exit.')
+@click.option('--profile-trace', metavar='<File>',
+              help='Write the SOAP calls as a Chrome trace (chrome://tracing) to <File>, implies --profile.')
 
 @pass_context
-def cli(ctx, username, password, server, disable_ssl_verification):
+def cli(ctx, username, password, server, disable_ssl_verification, session_cache, use_index, socket, debug,
+        profile, profile_trace):
     """Console utility for Vmware vSphere management."""
     ctx.username = username
     ctx.password = password
     ctx.server = server
     ctx.disable_ssl_verification = disable_ssl_verification
+    ctx.session_cache = session_cache
+    ctx.use_index = use_index
+    ctx.socket = socket
+    ctx.debug = debug
+    ctx.profile = profile or profile_trace is not None
+    if ctx.profile:
+        profiler = vsadmin.tools.profiler.start()
+
+        def report():
+            click.echo(profiler.summary(), err=True)
+            if profile_trace:
+                profiler.write_trace(profile_trace)
+        atexit.register(report)
@@ -1,28 +1,85 @@
 # -*- coding: utf-8 -*-
+import os
+import re
 import sys
 import click
 from vsadmin.cli import pass_context
-from vsadmin.tools.tools import vCenter
+import vsadmin.tools.daemon
+import vsadmin.tools.matcher
+import vsadmin.tools.report
 
 
 @click.command('search', short_help='search vm')
 @click.option('--name', metavar='<Virtual Machine Name>', help='name of vm entry to search')
 @click.option('--contains', is_flag=True, help='search not only complete but also partial virtual machine name matches')
-@click.option('--mac', metavar='<MAC Address>', help='mac of vm entry to search')
+@click.option('--mac', metavar='<MAC Address>', multiple=True, help='mac or mac prefix of vm entry to search, can be given several times')
+@click.option('--mac-file', metavar='<File>', type=click.File('r'), help='file with one mac or mac prefix per line to search, - for stdin')
 @click.option('--ip', metavar='<IP Address>', help='ip of vm entry to search')
 @click.option('--custom-fields', is_flag=True, help='search IP in custom_fields too')
 @click.option('--hostname', metavar='<Domain Name>', help='hostname of vm entry to search')
 @click.option('--task', metavar='<Service Desk Task ID>', help='service desk task id of vm entry to search')
+@click.option('--match', default='regex', show_default=True, type=click.Choice(vsadmin.tools.matcher.MATCH_MODES), help='how --contains names, --task and the task lines of --batch are matched: case-insensitive substring, shell glob or regular expression')
+@click.option('--batch', metavar='<File>', type=click.File('r'), help='file with one ip, hostname, name, mac or task per line ("<kind> <value>" or a bare value) to resolve in one session, - for stdin')
 @click.option('-i', '--interval', metavar='<Int>', default=20, show_default=True, help='interval in minutes to average the vSphere stats over')
 @click.option('-v', '--verbose', is_flag=True, help='show advanced information about virtual machine')
+@click.option('-j', '--jobs', metavar='<Int>', default=1, show_default=True, type=click.IntRange(min=1), help='number of virtual machines to fetch information for (or batch lookups to send) in parallel')
+@click.option('-w', '--watch', metavar='<Seconds>', type=click.IntRange(min=1), help='redraw the stats of the virtual machines every <Seconds> seconds until interrupted, only fetching the new samples (implies -v)')
+@click.option('-o', '--output', default='text', show_default=True, type=click.Choice(vsadmin.tools.report.OUTPUT_FORMATS), help='output format, json and ndjson write one record per virtual machine')
 @pass_context
-def cli(ctx, name, contains, mac, ip, custom_fields, hostname, task, verbose, interval):
+def cli(ctx, name, contains, mac, mac_file, ip, custom_fields, hostname, task, match, batch, verbose, interval, jobs, watch, output):
     """Search vm entry information in vCenter."""
-    vc = vCenter(ctx.server, ctx.username, ctx.password, ctx.disable_ssl_verification)
+    if watch is not None:
+        if batch is not None:
+            raise click.UsageError('--watch cannot be used with --batch.')
+        if output == 'json':
+            raise click.UsageError('--watch writes text or ndjson.')
+    if match == 'regex':
+        for pattern in (name if contains else None, task):
+            if pattern is not None:
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise click.BadParameter('invalid regular expression {!r}: {}'.format(pattern, e))
+    mac = list(mac)
+    if mac_file is not None:
+        mac.extend(line.strip() for line in mac_file if line.strip() and not line.startswith('#'))
+    options = dict(name=name, contains=contains, mac=mac, ip=ip, custom_fields=custom_fields,
+                   hostname=hostname, task=task, match=match, verbose=verbose, interval=interval, jobs=jobs,
+                   output=output, batch=batch, watch=watch)
+    if not ctx.profile and watch is None and ctx.socket and os.path.exists(ctx.socket):
+        # A profile has to see the calls and a watch runs until interrupted,
+        # so neither is run by the daemon
+        if batch is not None:
+            # The daemon gets the lines themselves, in-process they are streamed
+            options['batch'] = list(batch)
+        exit_code = vsadmin.tools.daemon.request(ctx.socket, 'search', ctx.server, ctx.username, options)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    # Imported here so requests answered by the daemon do not load pyVmomi
+    from vsadmin.tools.tools import vCenter
+    vc = vCenter(ctx.server, ctx.username, ctx.password, ctx.disable_ssl_verification,
+                 session_cache=ctx.session_cache, debug=ctx.debug, use_index=ctx.use_index)
+    search(ctx, vc, **options)
+
+
+def search(ctx, vc, name=None, contains=False, mac=None, ip=None, custom_fields=False,
+           hostname=None, task=None, match='regex', verbose=False, interval=20, jobs=1, output='text', batch=None,
+           watch=None):
+    import vsadmin.tools.batch
+    if batch is not None:
+        resolver = vsadmin.tools.batch.BatchResolver(vc, concurrency=jobs, match=match)
+        found_all = vsadmin.tools.batch.write_results(resolver.resolve(batch), output=output)
+        if verbose and resolver.lookups:
+            ctx.logerr('%d SearchIndex lookup(s) in %.2f s (%.0f lookups/s, %d in parallel).',
+                       resolver.lookups, resolver.lookup_time, resolver.lookups_per_second, jobs)
+        if not found_all:
+            sys.exit(1)
+        return
+
     vm = None
     if name:
         if contains:
-            vm = vc.search_vm_by_name(name, True)
+            vm = vc.search_vm_by_name(name, True, match=match)
         else:
             vm = vc.search_vm_by_name(name)
 
@@ -36,14 +93,26 @@ def cli(ctx, name, contains, mac, ip, custom_fields, hostname, task, verbose, in
         vm = vc.search_vm_by_hostname(hostname)
 
     elif task:
-        vm = vc.search_vm_by_task(task)
+        vm = vc.search_vm_by_task(task, match=match)
 
     elif mac:
         vm = vc.search_vm_by_mac(mac)
 
-    if vm:
-        for item in vm:
-            vc.print_vm_info(item, interval=interval, verbose=verbose)
+    if vm and watch is not None:
+        import vsadmin.tools.watch
+        try:
+            vsadmin.tools.watch.watch(vc, vm, watch, interval=interval, output=output)
+        except KeyboardInterrupt:
+            pass
+    elif vm:
+        vc.print_vms_info(vm, interval=interval, verbose=verbose, jobs=jobs, output=output)
+        if verbose and vc.perf_round_trips:
+            ctx.logerr('Performance data fetched in %d QueryPerf call(s), %d round trip(s) saved.',
+                       vc.perf_round_trips, vc.perf_round_trips_saved)
     else:
-        ctx.log('There is no VM found.')
+        if output == 'text':
+            ctx.log('There is no VM found.')
+        else:
+            # Keep stdout parseable
+            ctx.logerr('There is no VM found.')
         sys.exit(1)
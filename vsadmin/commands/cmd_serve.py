@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import click
+from vsadmin.cli import pass_context
+import vsadmin.tools.cache
+import vsadmin.tools.daemon
+from vsadmin.commands.cmd_search import search
+
+
+@click.command('serve', short_help='serve commands from a warm vCenter connection')
+@pass_context
+def cli(ctx):
+    """Keep a vCenter connection open and answer vsadmin commands over a Unix domain socket."""
+    # Imported here so that vsadmin --help does not load pyVmomi
+    from pyVmomi import vim
+    from vsadmin.tools.tools import vCenter
+    state = {}
+
+    def connect():
+        state['vc'] = vCenter(ctx.server, ctx.username, ctx.password, ctx.disable_ssl_verification,
+                              session_cache=ctx.session_cache, debug=ctx.debug, use_index=ctx.use_index)
+
+    def handle_search(**options):
+        try:
+            alive = state['vc'].serviceInstance.content.sessionManager.currentSession is not None
+        except vim.fault.NotAuthenticated:
+            alive = False
+        if not alive:
+            # The vCenter session has expired while the daemon was idle
+            connect()
+        state['vc'].reset_request_state()
+        search(ctx, state['vc'], **options)
+
+    vsadmin.tools.cache.ensure_cache_dir()
+    # Refuses to start before logging in when another daemon owns the socket
+    server = vsadmin.tools.daemon.DaemonServer(ctx.socket, ctx.server, ctx.username,
+                                               {'search': handle_search})
+    try:
+        connect()
+        ctx.logerr('Serving %s@%s on %s', ctx.username, ctx.server, ctx.socket)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
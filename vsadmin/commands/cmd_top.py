@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import click
+from vsadmin.cli import pass_context
+import vsadmin.tools.report
+
+
+@click.command('top', short_help='rank vms by their stats')
+@click.option('--cluster', metavar='<Cluster Name>', help='rank the virtual machines of this cluster')
+@click.option('--host', metavar='<Host Name>', help='rank the virtual machines of this host')
+@click.option('--folder', metavar='<Folder Name>', help='rank the virtual machines of this folder and its subfolders')
+@click.option('-s', '--sort', 'metric', default='latency', show_default=True, type=click.Choice(vsadmin.tools.report.TOP_METRICS), help='stat to rank by: worst virtual disk latency, total virtual disk IOPS, ballooned or swapped memory')
+@click.option('-n', '--count', metavar='<Int>', default=10, show_default=True, type=click.IntRange(min=1), help='number of virtual machines to show')
+@click.option('-i', '--interval', metavar='<Int>', default=20, show_default=True, help='interval in minutes to average the vSphere stats over')
+@click.option('-j', '--jobs', metavar='<Int>', default=1, show_default=True, type=click.IntRange(min=1), help='number of QueryPerf calls to send in parallel')
+@click.option('-v', '--verbose', is_flag=True, help='print the number of virtual machines and the time taken on stderr')
+@click.option('-o', '--output', default='text', show_default=True, type=click.Choice(vsadmin.tools.report.OUTPUT_FORMATS), help='output format, json and ndjson write one record per virtual machine')
+@pass_context
+def cli(ctx, cluster, host, folder, metric, count, interval, jobs, verbose, output):
+    """Rank the powered on virtual machines of a cluster, host or folder by their stats."""
+    containers = [(kind, name) for kind, name in (('cluster', cluster), ('host', host), ('folder', folder))
+                  if name is not None]
+    if len(containers) != 1:
+        raise click.UsageError('Give exactly one of --cluster, --host or --folder.')
+    kind, name = containers[0]
+
+    # Imported here so that vsadmin --help does not load pyVmomi
+    import vsadmin.tools.top
+    from vsadmin.tools.tools import vCenter
+    vc = vCenter(ctx.server, ctx.username, ctx.password, ctx.disable_ssl_verification,
+                 session_cache=ctx.session_cache, debug=ctx.debug, use_index=ctx.use_index)
+    collector = vsadmin.tools.top.TopCollector(vc, interval=interval, jobs=jobs)
+    container = collector.find_container(kind, name)
+    if container is None:
+        ctx.logerr('There is no %s named %s.', kind, name)
+        sys.exit(1)
+
+    startTime = time.time()
+    reports = collector.collect(container)
+    if verbose:
+        ctx.logerr('%d virtual machine(s) in %.2f s (%d QueryPerf call(s)).',
+                   len(reports), time.time() - startTime, vc.perf_round_trips)
+    reports = vsadmin.tools.top.rank(reports, metric, count)
+    if output == 'text':
+        if not reports:
+            ctx.log('There is no VM found.')
+            return
+        ctx.log(vsadmin.tools.report.render_top_header())
+    vsadmin.tools.report.write_reports(reports, vc.server, output=output,
+                                       render=vsadmin.tools.report.render_top_report)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import sys
+import time
+import vsadmin.tools.inventory
+import vsadmin.tools.macIndex
+import vsadmin.tools.matcher
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim
+
+KINDS = ('ip', 'hostname', 'name', 'mac', 'task')
+
+# Number of lines resolved and written together
+CHUNK_SIZE = 500
+
+INVENTORY_PATHS = ['name', 'config.annotation', 'guest.hostName', 'guest.net']
+
+IPV4 = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+
+# A MAC address without separators, which may as well be a virtual machine name
+HEX_TOKEN = re.compile('^[0-9a-fA-F]{12}$')
+
+
+def parse_line(line):
+    """Split a batch line into the kind of lookup and the value to look up
+
+    A line is either "<kind> <value>" with a kind from :data:`KINDS` or a
+    bare value. Bare values are IP addresses, MAC addresses, host names
+    (when they contain a dot) or virtual machine names, in that order. A
+    host name nothing was found for is looked up as a name too, virtual
+    machines are often named after their FQDN. So is a MAC address written
+    as 12 hex digits without separators, e.g. a virtual machine named
+    deadbeefcafe.
+
+    :param line: A line of the batch file
+    :type line: str
+    :returns: (kind, value) or None for blank lines and comments
+    :rtype: tuple
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    parts = line.split(None, 1)
+    if len(parts) == 2 and parts[0].lower() in KINDS:
+        return parts[0].lower(), parts[1].strip()
+    if IPV4.match(line):
+        return 'ip', line
+    mac = vsadmin.tools.macIndex.normalize_mac(line)
+    if mac is not None and not vsadmin.tools.macIndex.is_prefix(mac):
+        return 'mac', line
+    if '.' in line and ' ' not in line:
+        return 'hostname', line
+    return 'name', line
+
+
+class BatchResolver(object):
+    """Resolve many lookups over a single vCenter connection
+
+    IP addresses and host names are asked from the vCenter SearchIndex
+    first, one cheap call each. Everything else, and whatever the
+    SearchIndex did not know, is answered from one bulk inventory pass
+    that is only loaded when needed.
+
+    With a concurrency above one the SearchIndex calls of a chunk are sent
+    in parallel over that many keep-alive connections of the vCenter stub,
+    all of them sharing the session cookie.
+
+    :param vc: A connected vCenter
+    :type vc: vsadmin.tools.tools.vCenter
+    :param concurrency: Number of SearchIndex calls in flight
+    :type concurrency: int
+    :param match: How task lookups are matched, one of
+        :data:`vsadmin.tools.matcher.MATCH_MODES`
+    :type match: str
+    """
+
+    def __init__(self, vc, concurrency=1, match='regex'):
+        self.vc = vc
+        self.concurrency = concurrency
+        self.match = match
+        self.searchIndex = None
+        self.inventory = None
+        self.lookups = 0
+        self.lookup_time = 0.0
+        if concurrency > 1:
+            stub = vc.serviceInstance._stub
+            stub.poolSize = max(stub.poolSize, concurrency)
+
+    def load_inventory(self):
+        inventory = {'name': {}, 'ip': {}, 'hostname': {}, 'annotation': []}
+        for record in vsadmin.tools.inventory.collect(self.vc.serviceInstance, vim.VirtualMachine, INVENTORY_PATHS):
+            vm = record['obj']
+            inventory['name'].setdefault(record['name'], []).append(vm)
+            if record['guest.hostName']:
+                inventory['hostname'].setdefault(record['guest.hostName'].lower(), []).append(vm)
+            for nic in record['guest.net'] or []:
+                for ip in nic.ipAddress or []:
+                    inventory['ip'].setdefault(ip, []).append(vm)
+            if record['config.annotation']:
+                inventory['annotation'].append((record['config.annotation'], vm))
+        return inventory
+
+    def find_in_inventory(self, kind, value):
+        if self.inventory is None:
+            self.inventory = self.load_inventory()
+        if kind == 'task':
+            matcher = self.task_matcher(value)
+            return [vm for annotation, vm in self.inventory['annotation'] if matcher(annotation)]
+        if kind == 'hostname':
+            value = value.lower()
+        return list(self.inventory[kind].get(value, []))
+
+    def task_matcher(self, value):
+        try:
+            return vsadmin.tools.matcher.compile_matcher(value, self.match)
+        except re.error as e:
+            sys.stderr.write("WARNING: invalid regular expression {!r}: {}\n".format(value, e))
+            return lambda text: False
+
+    def uses_search_index(self, kind, value):
+        return (not self.vc.use_index and
+                (kind == 'hostname' or (kind == 'ip' and IPV4.match(value) is not None)))
+
+    def search_index_lookup(self, entry):
+        kind, value = entry
+        if kind == 'ip':
+            return self.searchIndex.FindByIp(None, value, True)
+        return self.searchIndex.FindByDnsName(None, value, True)
+
+    def search_index_lookups(self, entries):
+        """Ask the SearchIndex about ip and hostname entries
+
+        :returns: dict mapping the entries to the virtual machine found or None
+        :rtype: dict
+        """
+        entries = list(set(entry for entry in entries if self.uses_search_index(*entry)))
+        if not entries:
+            return {}
+        if self.searchIndex is None:
+            self.searchIndex = self.vc.serviceInstance.content.searchIndex
+        started = time.time()
+        if self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                found = list(executor.map(self.search_index_lookup, entries))
+        else:
+            found = [self.search_index_lookup(entry) for entry in entries]
+        self.lookup_time += time.time() - started
+        self.lookups += len(entries)
+        return dict(zip(entries, found))
+
+    def find(self, kind, value):
+        """Return the virtual machines matching one lookup without the SearchIndex
+
+        :rtype: list
+        """
+        vc = self.vc
+        if kind == 'mac':
+            mac = vsadmin.tools.macIndex.normalize_mac(value)
+            return vc.find_vms_by_mac(mac) if mac is not None else []
+        if vc.use_index:
+            if kind == 'ip':
+                morefs = vc.inventory_index.find_by_ip(value)
+            elif kind == 'hostname':
+                morefs = vc.inventory_index.find_by_hostname(value)
+            elif kind == 'name':
+                morefs = vc.inventory_index.find_by_name(value)
+            else:
+                morefs = vc.inventory_index.find_by_annotation_matching(self.task_matcher(value))
+            return [vc.get_vm_by_moref(moref) for moref in morefs]
+        return self.find_in_inventory(kind, value)
+
+    @property
+    def lookups_per_second(self):
+        return self.lookups / self.lookup_time if self.lookup_time else 0.0
+
+    def resolve(self, lines):
+        """Resolve batch lines, chunk by chunk
+
+        :param lines: Lines of the batch file
+        :type lines: iterable of str
+        :returns: generator of dict results in the order of the lines
+        """
+        chunk = []
+        for line in lines:
+            entry = parse_line(line)
+            if entry is None:
+                continue
+            chunk.append(entry)
+            if len(chunk) >= CHUNK_SIZE:
+                for result in self.resolve_chunk(chunk):
+                    yield result
+                chunk = []
+        for result in self.resolve_chunk(chunk):
+            yield result
+
+    def resolve_chunk(self, entries):
+        searched = self.search_index_lookups(entries)
+        matches = [[searched[entry]] if searched.get(entry) is not None else self.find(*entry)
+                   for entry in entries]
+        for i, (kind, value) in enumerate(entries):
+            if not matches[i] and (kind == 'hostname' or (kind == 'mac' and HEX_TOKEN.match(value))):
+                # A dotted name may be the name of the virtual machine rather
+                # than its guest host name, 12 hex digits may be a name too
+                found = self.find('name', value)
+                if found:
+                    entries[i] = ('name', value)
+                    matches[i] = found
+        vms = dict((vm._moId, vm) for found in matches for vm in found)
+        # One retrieve for the names of everything found in the chunk
+        names = dict((record['obj']._moId, record['name'])
+                     for record in vsadmin.tools.inventory.collect_objects(self.vc.serviceInstance, list(vms.values()),
+                                                                           vim.VirtualMachine, ['name']))
+        for (kind, value), found in zip(entries, matches):
+            yield {'kind': kind,
+                   'value': value,
+                   'found': len(found) > 0,
+                   'vms': [{'moref': vm._moId, 'name': names.get(vm._moId)} for vm in found]}
+
+
+def write_results(results, output='text', stream=None):
+    """Write batch results one by one as soon as they are resolved
+
+    The text output has one tab separated line per match
+    (kind, value, moref, name) and "-" for lookups without a match.
+
+    :param results: Results as returned by BatchResolver.resolve
+    :type results: iterable of dict
+    :param output: One of vsadmin.tools.report.OUTPUT_FORMATS
+    :type output: str
+    :param stream: Where to write to (default is stdout)
+    :returns: Whether every lookup found at least one virtual machine
+    :rtype: bool
+    """
+    if stream is None:
+        stream = sys.stdout
+    found_all = True
+    separator = '[\n'
+    for result in results:
+        found_all = found_all and result['found']
+        if output == 'json':
+            stream.write(separator + json.dumps(result))
+            separator = ',\n'
+        elif output == 'ndjson':
+            stream.write(json.dumps(result) + '\n')
+        elif result['found']:
+            for vm in result['vms']:
+                stream.write('{}\t{}\t{}\t{}\n'.format(result['kind'], result['value'], vm['moref'], vm['name']))
+        else:
+            stream.write('{}\t{}\t-\n'.format(result['kind'], result['value']))
+        stream.flush()
+    if output == 'json':
+        stream.write('[]\n' if separator == '[\n' else '\n]\n')
+    return found_all
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+CACHE_DIR = os.environ.get('VSADMIN_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'vsadmin'))
+
+SESSION_FILE = 'sessions.json'
+
+PERF_COUNTER_FILE = 'perfcounters.json'
+
+
+def get_cache_path(name):
+    """Return the full path of a file in the vsadmin cache directory
+
+    :param name: The cache file name
+    :type name: str
+    :rtype: str
+    """
+    return os.path.join(CACHE_DIR, name)
+
+
+def ensure_cache_dir():
+    """Create the cache directory accessible by its owner only"""
+    if not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR, 0o700)
+
+
+def load(name):
+    """Load a JSON cache file
+
+    :param name: The cache file name
+    :type name: str
+    :returns: The decoded content or None if the file is missing or broken
+    """
+    try:
+        with open(get_cache_path(name)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save(name, data):
+    """Atomically write a JSON cache file readable by its owner only
+
+    :param name: The cache file name
+    :type name: str
+    :param data: A JSON serializable object
+    """
+    ensure_cache_dir()
+    path = get_cache_path(name)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def session_key(server, username):
+    return '{}@{}'.format(username, server)
+
+
+def load_session(server, username):
+    """Return the cached vmware_soap_session cookie for a server and user
+
+    :rtype: str or None
+    """
+    sessions = load(SESSION_FILE) or {}
+    return sessions.get(session_key(server, username))
+
+
+def save_session(server, username, cookie):
+    """Store the vmware_soap_session cookie for a server and user"""
+    sessions = load(SESSION_FILE) or {}
+    sessions[session_key(server, username)] = cookie
+    save(SESSION_FILE, sessions)
+
+
+def drop_session(server, username):
+    """Forget the cached session of a server and user"""
+    sessions = load(SESSION_FILE) or {}
+    if sessions.pop(session_key(server, username), None) is not None:
+        save(SESSION_FILE, sessions)
+
+
+def load_perf_counters(instance_uuid, build):
+    """Return the cached perf counter catalog of a vCenter build
+
+    :param instance_uuid: The vCenter about.instanceUuid
+    :type instance_uuid: str
+    :param build: The vCenter about.build
+    :type build: str
+    :returns: dict mapping "group.name.rollup" to the counter key or None
+        if the catalog is not cached or was cached for another build
+    :rtype: dict
+    """
+    catalogs = load(PERF_COUNTER_FILE) or {}
+    catalog = catalogs.get(instance_uuid)
+    if catalog is None or catalog.get('build') != build:
+        return None
+    return catalog.get('counters')
+
+
+def save_perf_counters(instance_uuid, build, counters):
+    """Store the perf counter catalog of a vCenter build
+
+    The cache is best effort, failing to write it is silently ignored.
+    """
+    catalogs = load(PERF_COUNTER_FILE) or {}
+    catalogs[instance_uuid] = {'build': build, 'counters': counters}
+    try:
+        save(PERF_COUNTER_FILE, catalogs)
+    except (IOError, OSError):
+        pass
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import vsadmin.tools.cache
+
+# Seconds to wait for the daemon to start a command before running it in-process
+REQUEST_TIMEOUT = 5.0
+
+
+def get_socket_path():
+    """Return the default path of the vsadmin daemon socket
+
+    :rtype: str
+    """
+    return os.environ.get('VSADMIN_SOCKET', vsadmin.tools.cache.get_cache_path('vsadmin.sock'))
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+class MessageWriter(io.TextIOBase):
+    """Text stream forwarding writes to the client as JSON messages
+
+    It must refuse bytes: click.echo writes bytes to any stream accepting
+    ``write(b"")``.
+    """
+
+    def __init__(self, stream, name):
+        io.TextIOBase.__init__(self)
+        self.stream = stream
+        self.name = name
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if not isinstance(data, str):
+            raise TypeError('write() argument must be str, not {}'.format(type(data).__name__))
+        if data:
+            send_message(self.stream, {self.name: data})
+        return len(data)
+
+
+def is_listening(socket_path):
+    """Tell whether a daemon accepts connections on a Unix domain socket
+
+    :param socket_path: Path of the daemon Unix domain socket
+    :type socket_path: str
+    :rtype: bool
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (IOError, OSError):
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def request(socket_path, command, server, username, options, timeout=REQUEST_TIMEOUT):
+    """Run a command in a running vsadmin daemon
+
+    The output of the command is streamed to stdout/stderr as it arrives.
+    The daemon runs one command at a time: if it does not start this one
+    within ``timeout`` seconds, e.g. because it is busy or hung, the caller
+    runs the command in-process instead. Once started the command may take
+    as long as it needs.
+
+    :param socket_path: Path of the daemon Unix domain socket
+    :type socket_path: str
+    :param command: The command name, e.g. 'search'
+    :type command: str
+    :param server: The vCenter address the command is meant for
+    :type server: str
+    :param username: The vCenter user the command is meant for
+    :type username: str
+    :param options: The command options
+    :type options: dict
+    :param timeout: Seconds to wait for the daemon to start the command
+    :type timeout: float
+    :returns: The command exit code or None if there is no daemon serving
+        this server and user in time
+    :rtype: int
+    """
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except (IOError, OSError):
+        sock.close()
+        return None
+    with contextlib.closing(sock):
+        stream = sock.makefile('rwb')
+        try:
+            send_message(stream, {'command': command,
+                                  'server': server,
+                                  'username': username,
+                                  'options': options})
+            message = json.loads(stream.readline().decode('utf-8') or '{}')
+        except socket.timeout:
+            sys.stderr.write("WARNING: the vsadmin daemon on {} did not answer within {:g}s, "
+                             "running in-process.\n".format(socket_path, timeout))
+            return None
+        if 'accepted' not in message:
+            return None
+        sock.settimeout(None)
+        for line in stream:
+            message = json.loads(line.decode('utf-8'))
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'])
+                sys.stdout.flush()
+            elif 'stderr' in message:
+                sys.stderr.write(message['stderr'])
+            elif 'exit' in message:
+                return message['exit']
+    # The daemon went away in the middle of the command
+    return 1
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        message = json.loads(line.decode('utf-8'))
+        if not self.server.accepts(message):
+            send_message(self.wfile, {'declined': True})
+            return
+        send_message(self.wfile, {'accepted': True})
+        exit_code = 0
+        with contextlib.redirect_stdout(MessageWriter(self.wfile, 'stdout')), \
+                contextlib.redirect_stderr(MessageWriter(self.wfile, 'stderr')):
+            try:
+                self.server.handlers[message['command']](**message['options'])
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception as e:
+                print("ERROR: {}".format(e), file=sys.stderr)
+                exit_code = 1
+        send_message(self.wfile, {'exit': exit_code})
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Unix domain socket server running vsadmin commands one at a time
+
+    A socket left behind by a daemon that died is replaced, the server
+    refuses to start if another daemon still answers on it.
+
+    :param socket_path: Path of the Unix domain socket to listen on
+    :type socket_path: str
+    :param server: The vCenter address served by this daemon
+    :type server: str
+    :param username: The vCenter user served by this daemon
+    :type username: str
+    :param handlers: Mapping of command names to callables taking the
+        command options as keyword arguments
+    :type handlers: dict
+    """
+
+    def __init__(self, socket_path, server, username, handlers):
+        self.socket_path = socket_path
+        self.vc_server = server
+        self.vc_username = username
+        self.handlers = handlers
+        if os.path.exists(socket_path):
+            if is_listening(socket_path):
+                raise SystemExit("A vsadmin daemon is already listening on {}.".format(socket_path))
+            os.unlink(socket_path)
+        old_umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def accepts(self, message):
+        return (message.get('server') == self.vc_server and
+                message.get('username') == self.vc_username and
+                message.get('command') in self.handlers)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
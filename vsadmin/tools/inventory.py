@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from pyVmomi import vim, vmodl
+
+# Number of objects the PropertyCollector returns per page of a
+# RetrievePropertiesEx/ContinueRetrievePropertiesEx stream.
+PAGE_SIZE = 1000
+
+
+def build_filter_spec(view, obj_type, path_set):
+    """Build a PropertyCollector filter over the contents of a container view
+
+    :param view: A container view whose members should be collected
+    :type view: vim.view.ContainerView
+    :param obj_type: The managed object type to collect properties for
+    :type obj_type: type
+    :param path_set: A list of property paths to collect
+    :type path_set: list
+    :returns: A filter spec traversing the view
+    :rtype: vmodl.query.PropertyCollector.FilterSpec
+    """
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(name='traverseView',
+                                                                 path='view',
+                                                                 skip=False,
+                                                                 type=vim.view.ContainerView)
+    obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view,
+                                                        skip=True,
+                                                        selectSet=[traversal_spec])
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=obj_type,
+                                                           pathSet=list(path_set),
+                                                           all=False)
+    return vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec],
+                                                    propSet=[prop_spec])
+
+
+def to_record(obj_content, path_set):
+    """Convert a PropertyCollector ObjectContent into a plain dict
+
+    Every requested path is present in the record; paths the server did not
+    return (unset properties) are mapped to None.
+
+    :param obj_content: A single result object of the PropertyCollector
+    :type obj_content: vmodl.query.PropertyCollector.ObjectContent
+    :param path_set: A list of requested property paths
+    :type path_set: list
+    :returns: dict with the managed object under 'obj' and one key per path
+    :rtype: dict
+    """
+    record = dict.fromkeys(path_set)
+    record['obj'] = obj_content.obj
+    for prop in obj_content.propSet:
+        record[prop.name] = prop.val
+    return record
+
+
+def retrieve(property_collector, filter_spec, path_set, page_size=PAGE_SIZE):
+    """Stream records of a filter spec page by page
+
+    :param property_collector: The PropertyCollector to use
+    :type property_collector: vmodl.query.PropertyCollector
+    :param filter_spec: A filter spec describing objects and properties
+    :type filter_spec: vmodl.query.PropertyCollector.FilterSpec
+    :param path_set: A list of requested property paths
+    :type path_set: list
+    :param page_size: Maximum number of objects returned per round trip
+    :type page_size: int
+    :returns: generator of dict records
+    """
+    options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+    result = property_collector.RetrievePropertiesEx([filter_spec], options)
+    token = None
+    try:
+        while result is not None:
+            token = result.token
+            for obj_content in result.objects:
+                yield to_record(obj_content, path_set)
+            if not token:
+                break
+            result = property_collector.ContinueRetrievePropertiesEx(token)
+            token = None
+    finally:
+        # The consumer stopped early; release the server side result set.
+        if token:
+            property_collector.CancelRetrievePropertiesEx(token)
+
+
+def collect(service_instance, obj_type, path_set, container=None, recurse=True,
+            page_size=PAGE_SIZE):
+    """Collect properties for every object of a type in a single stream
+
+    A ContainerView over the container is created for the duration of the
+    retrieval and destroyed afterwards.
+
+    :param service_instance: The vCenter ServiceInstance
+    :type service_instance: vim.ServiceInstance
+    :param obj_type: The managed object type to collect, e.g. vim.VirtualMachine
+    :type obj_type: type
+    :param path_set: A list of property paths to collect
+    :type path_set: list
+    :param container: A folder, datacenter or compute resource to search in
+        (default is the root folder)
+    :type container: vim.ManagedEntity
+    :param recurse: Whether the view should include nested containers
+    :type recurse: bool
+    :param page_size: Maximum number of objects returned per round trip
+    :type page_size: int
+    :returns: generator of dict records
+    """
+    content = service_instance.content
+    if container is None:
+        container = content.rootFolder
+    view = content.viewManager.CreateContainerView(container, [obj_type], recurse)
+    try:
+        filter_spec = build_filter_spec(view, obj_type, path_set)
+        for record in retrieve(content.propertyCollector, filter_spec,
+                               path_set, page_size=page_size):
+            yield record
+    finally:
+        view.Destroy()
+
+
+def collect_objects(service_instance, objs, obj_type, path_set, page_size=PAGE_SIZE):
+    """Collect properties for a known list of objects in a single stream
+
+    :param service_instance: The vCenter ServiceInstance
+    :type service_instance: vim.ServiceInstance
+    :param objs: The managed objects to collect properties for
+    :type objs: list
+    :param obj_type: The managed object type of the objects
+    :type obj_type: type
+    :param path_set: A list of property paths to collect
+    :type path_set: list
+    :param page_size: Maximum number of objects returned per round trip
+    :type page_size: int
+    :returns: generator of dict records
+    """
+    if not objs:
+        return
+    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objs]
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=obj_type,
+                                                           pathSet=list(path_set),
+                                                           all=False)
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=obj_specs,
+                                                           propSet=[prop_spec])
+    for record in retrieve(service_instance.content.propertyCollector, filter_spec,
+                           path_set, page_size=page_size):
+        yield record
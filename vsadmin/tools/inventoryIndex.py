@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import time
+import vsadmin.tools.cache
+import vsadmin.tools.inventory
+from pyVmomi import vim, vmodl
+
+INDEX_PATHS = ['name',
+               'config.annotation',
+               'config.hardware.device',
+               'customValue',
+               'guest.hostName',
+               'guest.net']
+
+# Maximum number of object updates returned by one WaitForUpdatesEx call.
+UPDATE_PAGE_SIZE = 1000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS vm (moref TEXT PRIMARY KEY, name TEXT, hostname TEXT, annotation TEXT);
+CREATE TABLE IF NOT EXISTS vm_mac (moref TEXT, mac TEXT);
+CREATE TABLE IF NOT EXISTS vm_ip (moref TEXT, ip TEXT);
+CREATE TABLE IF NOT EXISTS vm_custom (moref TEXT, key INTEGER, value TEXT);
+CREATE INDEX IF NOT EXISTS vm_name_idx ON vm (name);
+CREATE INDEX IF NOT EXISTS vm_hostname_idx ON vm (hostname COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS vm_mac_idx ON vm_mac (mac);
+CREATE INDEX IF NOT EXISTS vm_mac_moref_idx ON vm_mac (moref);
+CREATE INDEX IF NOT EXISTS vm_ip_idx ON vm_ip (ip);
+CREATE INDEX IF NOT EXISTS vm_ip_moref_idx ON vm_ip (moref);
+CREATE INDEX IF NOT EXISTS vm_custom_moref_idx ON vm_custom (moref);
+'''
+
+
+class InventoryIndex(object):
+    """Local SQLite index of the virtual machine inventory
+
+    The index is filled from a dedicated PropertyCollector filter over all
+    virtual machines. The first WaitForUpdatesEx call returns the full
+    inventory; the returned version is stored with the index so every later
+    :meth:`refresh` only pulls the changes since then. Collectors live as
+    long as the vSphere session, so incremental refreshes across runs need
+    the session cache; when the collector is gone the index is rebuilt.
+    """
+
+    def __init__(self, service_instance, path=None):
+        self.serviceInstance = service_instance
+        if path is None:
+            vsadmin.tools.cache.ensure_cache_dir()
+            about = service_instance.content.about
+            path = vsadmin.tools.cache.get_cache_path('inventory-{}.sqlite'.format(about.instanceUuid))
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def get_state(self, key):
+        row = self.db.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)', (key, value))
+
+    def refresh(self):
+        """Bring the index up to date
+
+        :returns: Number of object updates applied
+        :rtype: int
+        """
+        collector_id = self.get_state('collector')
+        version = self.get_state('version')
+        if collector_id and version is not None:
+            collector = vmodl.query.PropertyCollector(collector_id, self.serviceInstance._stub)
+            try:
+                return self.apply_updates(collector, version)
+            except (vmodl.fault.ManagedObjectNotFound, vmodl.fault.InvalidArgument,
+                    vmodl.query.InvalidCollectorVersion, vim.fault.NotAuthenticated):
+                pass
+        return self.rebuild()
+
+    def rebuild(self):
+        """Drop the index and load the whole inventory again"""
+        content = self.serviceInstance.content
+        collector = content.propertyCollector.CreatePropertyCollector()
+        # The view must outlive this call, it is released with the collector session
+        view = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True)
+        filter_spec = vsadmin.tools.inventory.build_filter_spec(view, vim.VirtualMachine, INDEX_PATHS)
+        collector.CreateFilter(filter_spec, partialUpdates=False)
+        with self.db:
+            for table in ('vm', 'vm_mac', 'vm_ip', 'vm_custom', 'state'):
+                self.db.execute('DELETE FROM {}'.format(table))
+            self.set_state('collector', collector._moId)
+        return self.apply_updates(collector, '')
+
+    def apply_updates(self, collector, version):
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0,
+                                                            maxObjectUpdates=UPDATE_PAGE_SIZE)
+        applied = 0
+        while True:
+            update = collector.WaitForUpdatesEx(version, options)
+            if update is None:
+                break
+            with self.db:
+                for filter_set in update.filterSet:
+                    for obj_update in filter_set.objectSet:
+                        self.apply_object_update(obj_update)
+                        applied += 1
+                version = update.version
+                self.set_state('version', version)
+                self.set_state('refreshed', str(time.time()))
+            if not update.truncated:
+                break
+        return applied
+
+    def apply_object_update(self, obj_update):
+        moref = obj_update.obj._moId
+        if obj_update.kind == 'leave':
+            self.delete_vm(moref)
+            return
+        if obj_update.kind == 'enter':
+            self.db.execute('INSERT OR REPLACE INTO vm (moref) VALUES (?)', (moref,))
+        for change in obj_update.changeSet:
+            value = change.val if change.op != 'remove' else None
+            self.apply_change(moref, change.name, value)
+
+    def apply_change(self, moref, name, value):
+        if name == 'name':
+            self.db.execute('UPDATE vm SET name = ? WHERE moref = ?', (value, moref))
+        elif name == 'guest.hostName':
+            self.db.execute('UPDATE vm SET hostname = ? WHERE moref = ?', (value, moref))
+        elif name == 'config.annotation':
+            self.db.execute('UPDATE vm SET annotation = ? WHERE moref = ?', (value, moref))
+        elif name == 'config.hardware.device':
+            self.db.execute('DELETE FROM vm_mac WHERE moref = ?', (moref,))
+            self.db.executemany('INSERT INTO vm_mac (moref, mac) VALUES (?, ?)',
+                                [(moref, device.macAddress.lower()) for device in value or []
+                                 if getattr(device, 'macAddress', None)])
+        elif name == 'guest.net':
+            self.db.execute('DELETE FROM vm_ip WHERE moref = ?', (moref,))
+            self.db.executemany('INSERT INTO vm_ip (moref, ip) VALUES (?, ?)',
+                                [(moref, ip) for nic in value or [] for ip in nic.ipAddress or []])
+        elif name == 'customValue':
+            self.db.execute('DELETE FROM vm_custom WHERE moref = ?', (moref,))
+            self.db.executemany('INSERT INTO vm_custom (moref, key, value) VALUES (?, ?, ?)',
+                                [(moref, item.key, getattr(item, 'value', None)) for item in value or []])
+
+    def delete_vm(self, moref):
+        for table in ('vm', 'vm_mac', 'vm_ip', 'vm_custom'):
+            self.db.execute('DELETE FROM {} WHERE moref = ?'.format(table), (moref,))
+
+    def find_by_name(self, name):
+        return [row[0] for row in self.db.execute('SELECT moref FROM vm WHERE name = ? LIMIT 1', (name,))]
+
+    def find_by_name_matching(self, matcher):
+        return [moref for moref, name in self.db.execute('SELECT moref, name FROM vm ORDER BY rowid')
+                if matcher(name)]
+
+    def find_by_mac(self, mac):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT moref FROM vm_mac WHERE mac = ?', (mac.lower(),))]
+
+    def find_by_mac_prefix(self, prefix):
+        # MAC addresses only hold hex digits and colons, which all sort before '~'
+        prefix = prefix.lower()
+        return [row[0] for row in self.db.execute('SELECT DISTINCT moref FROM vm_mac WHERE mac >= ? AND mac < ?',
+                                                  (prefix, prefix + '~'))]
+
+    def find_by_ip(self, ip):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT moref FROM vm_ip WHERE ip = ?', (ip,))]
+
+    def find_by_hostname(self, hostname):
+        return [row[0] for row in self.db.execute('SELECT moref FROM vm WHERE hostname = ? COLLATE NOCASE', (hostname,))]
+
+    def find_by_annotation_matching(self, matcher):
+        return [moref for moref, annotation in self.db.execute('SELECT moref, annotation FROM vm ORDER BY rowid')
+                if matcher(annotation)]
+
+    def find_by_custom_value(self, key, text):
+        return [row[0] for row in self.db.execute('SELECT DISTINCT moref FROM vm_custom '
+                                                  "WHERE key = ? AND value != '' AND instr(value, ?) > 0",
+                                                  (key, text))]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import bisect
+import re
+
+MAC_SEPARATORS = re.compile('[:.-]')
+
+HEX_DIGITS = re.compile('^[0-9a-f]*$')
+
+
+def normalize_mac(mac):
+    """Bring a MAC address or MAC prefix into the vCenter notation
+
+    Separators may be colons, dashes, dots or missing, letters may be upper
+    case: 00-50-56-AB-CD-EF, 0050.56ab.cdef and 005056abcdef all become
+    00:50:56:ab:cd:ef. A prefix such as 00:50:56 stays a prefix.
+
+    :param mac: A MAC address or the first octets of one
+    :type mac: str
+    :returns: The normalized MAC address or prefix, or None if it is invalid
+    :rtype: str
+    """
+    digits = MAC_SEPARATORS.sub('', mac.strip()).lower()
+    if not digits or len(digits) > 12 or len(digits) % 2 or not HEX_DIGITS.match(digits):
+        return None
+    return ':'.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+
+
+def is_prefix(mac):
+    """Tell whether a normalized MAC address is only a prefix
+
+    :param mac: A normalized MAC address or prefix
+    :type mac: str
+    :rtype: bool
+    """
+    return len(mac) < 17
+
+
+class MacIndex(object):
+    """In-memory index of virtual machine MAC addresses
+
+    Exact lookups go through a dict, prefix (e.g. OUI) lookups through a
+    sorted list of the addresses.
+    """
+
+    def __init__(self):
+        self.macs = {}
+        self.sorted_macs = []
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the index from inventory records with config.hardware.device
+
+        :param records: Records as returned by vsadmin.tools.inventory.collect
+        :type records: iterable of dict
+        :rtype: MacIndex
+        """
+        index = cls()
+        for record in records:
+            for device in record['config.hardware.device'] or []:
+                if (device.key >= 4000) and (device.key < 5000) and getattr(device, 'macAddress', None):
+                    index._add(device.macAddress, record['obj'])
+        index.sorted_macs = sorted(index.macs)
+        return index
+
+    def _add(self, mac, obj):
+        objs = self.macs.setdefault(normalize_mac(mac), [])
+        if obj not in objs:
+            objs.append(obj)
+
+    def find(self, mac):
+        """Return the objects with a MAC address or MAC prefix
+
+        :param mac: A normalized MAC address or prefix
+        :type mac: str
+        :rtype: list
+        """
+        if not is_prefix(mac):
+            return list(self.macs.get(mac, []))
+        result = []
+        position = bisect.bisect_left(self.sorted_macs, mac)
+        while position < len(self.sorted_macs) and self.sorted_macs[position].startswith(mac):
+            for obj in self.macs[self.sorted_macs[position]]:
+                if obj not in result:
+                    result.append(obj)
+            position += 1
+        return result
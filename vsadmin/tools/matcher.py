@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import fnmatch
+import functools
+import re
+
+MATCH_MODES = ('literal', 'glob', 'regex')
+
+
+@functools.lru_cache(maxsize=64)
+def compile_matcher(pattern, mode='regex'):
+    """Compile a search pattern once into a predicate
+
+    - literal: case-insensitive substring match
+    - glob: case-insensitive shell pattern (``*``, ``?``, ``[...]``)
+      matched against the whole text
+    - regex: regular expression searched anywhere in the text
+
+    Compiled matchers are cached, so repeated searches with the same
+    pattern do not compile it again.
+
+    :param pattern: The pattern given by the user
+    :type pattern: str
+    :param mode: One of :data:`MATCH_MODES`
+    :type mode: str
+    :returns: A function taking a text and returning whether it matches,
+        None and empty texts never match
+    :rtype: callable
+    """
+    if mode == 'literal':
+        needle = pattern.casefold()
+
+        def matches(text):
+            return bool(text) and needle in text.casefold()
+        return matches
+
+    if mode == 'glob':
+        search = re.compile(fnmatch.translate(pattern), re.IGNORECASE | re.DOTALL).match
+    elif mode == 'regex':
+        search = re.compile(pattern).search
+    else:
+        raise ValueError('Unknown match mode {}'.format(mode))
+
+    def matches(text):
+        return bool(text) and search(text) is not None
+    return matches
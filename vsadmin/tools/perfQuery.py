@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import math
+from collections import OrderedDict
+from pyVmomi import vim
+import vsadmin.tools.perfSeries
+
+# vSphere realtime statistics interval (20 seconds).
+REALTIME_INTERVAL_ID = 20
+
+# Seconds of realtime statistics kept by the hosts
+REALTIME_RETENTION = 3600
+
+
+def plan_interval(window, historical_intervals=()):
+    """Pick the statistics interval to query a window with
+
+    Windows up to :data:`REALTIME_RETENTION` are queried in realtime,
+    longer ones with the finest enabled historical interval whose
+    retention covers the window, i.e. the shortest sampling period that
+    still reaches back far enough, which returns the most samples among
+    them. A window longer than every retention gets the longest kept
+    interval.
+
+    :param window: The length of the window in seconds
+    :type window: int
+    :param historical_intervals: ``PerformanceManager.historicalInterval``,
+        only read for windows longer than the realtime retention
+    :type historical_intervals: vim.HistoricalInterval[]
+    :returns: The intervalId and the maxSample to query with, maxSample is
+        None for historical intervals as vCenter ignores it for them
+    :rtype: tuple
+    """
+    enabled = [interval for interval in historical_intervals if interval.enabled]
+    if window <= REALTIME_RETENTION or not enabled:
+        return REALTIME_INTERVAL_ID, int(math.ceil(float(window) / REALTIME_INTERVAL_ID)) or 1
+    covering = [interval for interval in enabled if interval.length >= window]
+    if covering:
+        return min(covering, key=lambda interval: interval.samplingPeriod).samplingPeriod, None
+    return max(enabled, key=lambda interval: interval.length).samplingPeriod, None
+
+
+class PerfQuery(object):
+    """Collect performance metrics of one or more entities in a single QueryPerf
+
+    Metrics are registered with :meth:`add`, fetched together with
+    :meth:`execute` and read back with :meth:`values` or reduced with
+    :meth:`reduce`, the samples being kept in a
+    :class:`vsadmin.tools.perfSeries.SeriesTable`. Every entity gets its
+    own QuerySpec carrying all of its MetricIds, so the whole plan costs a
+    single round trip no matter how many counters and instances it holds.
+    """
+
+    def __init__(self, perf_manager, start_time, end_time, interval_id=REALTIME_INTERVAL_ID, max_sample=None):
+        self.perf_manager = perf_manager
+        self.start_time = start_time
+        self.end_time = end_time
+        self.interval_id = interval_id
+        self.max_sample = max_sample
+        self.entities = OrderedDict()
+        self.metrics = OrderedDict()
+        self.series = vsadmin.tools.perfSeries.SeriesTable()
+        self.instance_keys = {}
+        self.round_trips = 0
+
+    @staticmethod
+    def metric_key(entity, counter_id, instance=""):
+        return (entity._moId, counter_id, instance)
+
+    def add(self, entity, counter_id, instance=""):
+        """Register a metric to be fetched
+
+        :param entity: The managed entity the metric belongs to
+        :type entity: vim.ManagedEntity
+        :param counter_id: The performance counter key
+        :type counter_id: int
+        :param instance: The counter instance ("" for the aggregate value)
+        :type instance: str
+        :returns: The key the metric values are stored under
+        :rtype: tuple
+        """
+        key = self.metric_key(entity, counter_id, instance)
+        if key not in self.metrics:
+            self.entities.setdefault(entity._moId, entity)
+            self.metrics[key] = vim.PerformanceManager.MetricId(counterId=counter_id,
+                                                                instance=instance)
+        return key
+
+    def build_query_specs(self):
+        """Build one QuerySpec per entity with all of its registered metrics
+
+        :rtype: vim.PerformanceManager.QuerySpec[]
+        """
+        metric_ids = OrderedDict((moid, []) for moid in self.entities)
+        for (moid, counter_id, instance), metric_id in self.metrics.items():
+            metric_ids[moid].append(metric_id)
+        return [vim.PerformanceManager.QuerySpec(intervalId=self.interval_id,
+                                                 entity=self.entities[moid],
+                                                 metricId=metric_ids[moid],
+                                                 startTime=self.start_time,
+                                                 endTime=self.end_time,
+                                                 maxSample=self.max_sample)
+                for moid in self.entities]
+
+    def execute(self):
+        """Fetch every registered metric in one QueryPerf call
+
+        The query can be executed again, e.g. after moving
+        :attr:`start_time`, the samples of the previous call are replaced.
+
+        :returns: The raw QueryPerf result
+        :rtype: vim.PerformanceManager.EntityMetricBase[]
+        """
+        if not self.metrics:
+            return []
+        perf_results = self.perf_manager.QueryPerf(querySpec=self.build_query_specs())
+        self.round_trips += 1
+        self.series = vsadmin.tools.perfSeries.SeriesTable.from_entity_metrics(perf_results, self.metric_key)
+        self.instance_keys = {}
+        for key in self.series.keys():
+            self.instance_keys.setdefault(key[:2], []).append(key[2])
+        return perf_results
+
+    def values(self, entity, counter_id, instance=""):
+        """Return the valid samples of a registered metric
+
+        :returns: The sample values without the missing (-1) ones, empty if
+            the server returned none
+        :rtype: array.array
+        """
+        return self.series.samples(self.metric_key(entity, counter_id, instance))
+
+    def reduce(self, entity, counter_id, instance="", how='mean'):
+        """Reduce the samples of a registered metric
+
+        :param how: One of :data:`vsadmin.tools.perfSeries.REDUCTIONS`
+        :type how: str
+        :returns: The value, None if the server returned no valid sample
+        :rtype: float
+        """
+        if how not in vsadmin.tools.perfSeries.REDUCTIONS:
+            raise ValueError('Unknown reduction {}'.format(how))
+        return getattr(self.series, how)(self.metric_key(entity, counter_id, instance))
+
+    def instances(self, entity, counter_id):
+        """Return the instances the server returned a metric for
+
+        Meant for metrics registered with the "*" instance, for which the
+        server returns one series per instance.
+
+        :rtype: list
+        """
+        return self.instance_keys.get((entity._moId, counter_id), [])
+
+    @property
+    def round_trips_saved(self):
+        """Number of QueryPerf calls avoided compared to one call per metric"""
+        return max(len(self.metrics) - self.round_trips, 0)
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+import array
+import functools
+import math
+from collections import OrderedDict
+
+# Value vSphere returns for a sample it could not collect
+MISSING = -1
+
+REDUCTIONS = ('mean', 'max', 'p95', 'rate')
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+    """Return the numpy module, None when it is not installed"""
+    # Imported on first use, NumPy takes about 100 ms to load
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def to_seconds(timestamp):
+    return timestamp.timestamp()
+
+
+def nearest_rank(sorted_values, percent):
+    """Return the nearest-rank percentile of sorted, non-empty values"""
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class SampleTimes(object):
+    """The sample timestamps of a QueryPerf entity, converted on first use
+
+    Only the timestamp accessors need them, the reductions never pay for
+    the conversion.
+    """
+
+    __slots__ = ('sample_info', '_seconds')
+
+    def __init__(self, sample_info):
+        self.sample_info = sample_info
+        self._seconds = None
+
+    def seconds(self):
+        if self._seconds is None:
+            self._seconds = array.array('d', [to_seconds(sample.timestamp) for sample in self.sample_info])
+        return self._seconds
+
+    def period(self):
+        """Return the sampling period in seconds, None without samples"""
+        return self.sample_info[0].interval if self.sample_info else None
+
+
+class SeriesTable(object):
+    """Samples of many metric series packed in one contiguous buffer
+
+    The values of every series are a slice of one ``array('d')``, the
+    timestamps are shared by all the series of an entity. Missing samples
+    (-1) are dropped on insertion. The reductions return None for a
+    series without samples; :meth:`reduce` computes one reduction for
+    every series at once and is vectorized when NumPy is installed.
+    """
+
+    def __init__(self):
+        self.values = array.array('d')
+        # key -> (start, stop, timestamps, raw samples when some were missing)
+        self.index = OrderedDict()
+
+    @classmethod
+    def from_entity_metrics(cls, entity_metrics, key):
+        """Build a table from the result of QueryPerf
+
+        :param entity_metrics: The QueryPerf result
+        :type entity_metrics: vim.PerformanceManager.EntityMetric[]
+        :param key: Function returning the key of a series from the
+            entity, the counter id and the instance
+        :type key: callable
+        :rtype: SeriesTable
+        """
+        table = cls()
+        for entity_metric in entity_metrics:
+            timestamps = SampleTimes(entity_metric.sampleInfo or [])
+            for series in entity_metric.value or []:
+                table.add(key(entity_metric.entity, series.id.counterId, series.id.instance),
+                          timestamps, series.value)
+        return table
+
+    def add(self, key, timestamps, values):
+        """Append a series, replacing the samples of the key if it was already added
+
+        :param key: The key of the series
+        :param timestamps: POSIX timestamp of every sample, or a :class:`SampleTimes`
+        :param values: The samples, -1 for missing ones
+        """
+        start = len(self.values)
+        raw = None
+        if MISSING in values:
+            # The timestamps of the valid samples are only filtered when asked for
+            raw = values
+            values = [value for value in values if value != MISSING]
+        elif not isinstance(values, list):
+            values = list(values)
+        # fromlist is much faster than extend for lists
+        self.values.fromlist(values)
+        self.index[key] = (start, len(self.values), timestamps, raw)
+
+    def _sample_times(self, entry):
+        start, stop, timestamps, raw = entry
+        if isinstance(timestamps, SampleTimes):
+            timestamps = timestamps.seconds()
+        if raw is not None:
+            return array.array('d', [timestamp for timestamp, value in zip(timestamps, raw) if value != MISSING])
+        if not isinstance(timestamps, array.array):
+            return array.array('d', timestamps)
+        return timestamps
+
+    def _period(self, entry):
+        timestamps = entry[2]
+        if isinstance(timestamps, SampleTimes):
+            return timestamps.period()
+        return timestamps[1] - timestamps[0] if len(timestamps) > 1 else None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def samples(self, key):
+        """Return the valid samples of a series
+
+        :rtype: array.array
+        """
+        start, stop = self.index[key][:2] if key in self.index else (0, 0)
+        return self.values[start:stop]
+
+    def sample_times(self, key):
+        """Return the POSIX timestamps of the valid samples of a series
+
+        :rtype: array.array
+        """
+        if key not in self.index:
+            return array.array('d')
+        return self._sample_times(self.index[key])
+
+    def last_timestamp(self, key):
+        """Return the timestamp of the newest valid sample, None without samples"""
+        timestamps = self.sample_times(key)
+        return timestamps[-1] if timestamps else None
+
+    def mean(self, key):
+        values = self.samples(key)
+        return math.fsum(values) / len(values) if values else None
+
+    def max(self, key):
+        values = self.samples(key)
+        return max(values) if values else None
+
+    def p95(self, key):
+        values = self.samples(key)
+        return nearest_rank(sorted(values), 95) if values else None
+
+    def rate(self, key):
+        """Return the mean per second of a series of per-interval totals
+
+        Meant for counters with the summation rollup, e.g. cpu.ready.summation:
+        every sample is the total of its sampling period, so the rate is
+        ``sum(values) / (len(values) * period)``. None without samples or
+        when the sampling period is unknown.
+        """
+        mean = self.mean(key)
+        period = self._period(self.index[key]) if mean is not None else None
+        return mean / period if period else None
+
+    def reduce(self, how, keys=None):
+        """Apply one reduction to many series
+
+        :param how: One of :data:`REDUCTIONS`
+        :type how: str
+        :param keys: The series to reduce (default is all of them)
+        :returns: A dict of key to value, None for series without samples
+        :rtype: dict
+        """
+        if how not in REDUCTIONS:
+            raise ValueError('Unknown reduction {}'.format(how))
+        if keys is None:
+            keys = list(self.index)
+        numpy = load_numpy()
+        if not self.values or (numpy is None and how in ('p95', 'rate')):
+            reduction = getattr(self, how)
+            return dict((key, reduction(key)) for key in keys)
+        result = dict.fromkeys(keys)
+        bounds = [(key,) + self.index[key][:2] for key in keys if key in self.index]
+        bounds = [(key, start, stop) for key, start, stop in bounds if stop > start]
+        if not bounds:
+            return result
+        if numpy is None:
+            values = self.values
+            if how == 'mean':
+                result.update((key, math.fsum(values[start:stop]) / (stop - start)) for key, start, stop in bounds)
+            else:
+                result.update((key, max(values[start:stop])) for key, start, stop in bounds)
+            return result
+        values = numpy.frombuffer(self.values, dtype=numpy.float64)
+        starts = numpy.array([start for key, start, stop in bounds], dtype=numpy.intp)
+        stops = numpy.array([stop for key, start, stop in bounds], dtype=numpy.intp)
+        lengths = stops - starts
+        if how == 'p95':
+            # One sorted matrix per series length, there are few distinct ones
+            reduced = numpy.empty(len(bounds))
+            for length in numpy.unique(lengths).tolist():
+                rows = numpy.flatnonzero(lengths == length)
+                matrix = numpy.sort(values[starts[rows, None] + numpy.arange(length)], axis=1)
+                reduced[rows] = matrix[:, max(int(math.ceil(0.95 * length)), 1) - 1]
+        else:
+            if numpy.array_equal(starts[1:], stops[:-1]):
+                # The series follow each other in the buffer, no copy needed
+                segments = values[starts[0]:stops[-1]]
+                offsets = starts - starts[0]
+            else:
+                # reduceat works on the segments [start, next start), gather them first
+                # so that series of other keys in between are skipped
+                segments = numpy.concatenate([values[start:stop] for key, start, stop in bounds])
+                offsets = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+            if how == 'max':
+                reduced = numpy.maximum.reduceat(segments, offsets)
+            else:
+                reduced = numpy.add.reduceat(segments, offsets) / lengths
+            if how == 'rate':
+                # NaN for the series whose sampling period is unknown
+                periods = numpy.array([self._period(self.index[key]) or numpy.nan for key, start, stop in bounds])
+                reduced = reduced / periods
+        result.update((key, None if math.isnan(value) else value)
+                      for (key, start, stop), value in zip(bounds, reduced.tolist()))
+        return result
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+# The active profiler, set by start()
+PROFILER = None
+
+VSADMIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generic helpers whose calls are attributed to the function using them
+PLUMBING_MODULES = ('inventory', 'profiler')
+
+
+def start():
+    """Start recording the SOAP calls of every instrumented stub
+
+    :rtype: Profiler
+    """
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = Profiler()
+    return PROFILER
+
+
+def instrument(stub, label):
+    """Record the calls of a stub adapter if profiling was started
+
+    :param stub: A pyVmomi stub adapter
+    :type stub: SoapStubAdapter
+    :param label: The service the stub talks to, e.g. 'vim', 'pbm', 'vsan'
+    :type label: str
+    :returns: The stub
+    """
+    if PROFILER is not None:
+        PROFILER.wrap(stub, label)
+    return stub
+
+
+def caller_functions():
+    """Return the vsadmin functions on the stack, innermost first"""
+    functions = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(VSADMIN_DIR) and not frame.f_code.co_name.startswith('<'):
+            module = os.path.splitext(os.path.basename(filename))[0]
+            if module not in PLUMBING_MODULES:
+                functions.append('{}.{}'.format(module, frame.f_code.co_name))
+        frame = frame.f_back
+    return functions
+
+
+class Profiler(object):
+    """Recorder of SOAP round trips
+
+    For every call the service, method, managed object type, request and
+    response size in bytes (as sent and received on the wire, when the stub
+    is a SoapStubAdapter), latency and the calling vsadmin functions are
+    kept.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.events = []
+        self.started = time.time()
+
+    def wrap(self, stub, label):
+        if getattr(stub, '_vsadminProfiled', False):
+            return
+        stub._vsadminProfiled = True
+        profiler = self
+        local = self.local
+        invokeMethod = stub.InvokeMethod
+        invokeAccessor = stub.InvokeAccessor
+
+        def InvokeMethod(mo, info, args, *rest):
+            accessor = getattr(local, 'accessor', None)
+            local.request_size = None
+            local.response_size = None
+            if accessor is not None and info.wsdlName == 'RetrievePropertiesEx':
+                name = 'get {}'.format(accessor)
+            else:
+                name = info.wsdlName
+            started = time.time()
+            try:
+                return invokeMethod(mo, info, args, *rest)
+            finally:
+                profiler.record(label, name, mo, started, time.time() - started,
+                                local.request_size, local.response_size)
+                local.recorded = True
+
+        def InvokeAccessor(mo, info):
+            # A SoapStubAdapter reads properties through InvokeMethod, other
+            # stubs are recorded here
+            local.accessor = info.name
+            local.recorded = False
+            started = time.time()
+            try:
+                return invokeAccessor(mo, info)
+            finally:
+                local.accessor = None
+                if not local.recorded:
+                    profiler.record(label, 'get {}'.format(info.name), mo, started, time.time() - started, None, None)
+
+        stub.InvokeMethod = InvokeMethod
+        stub.InvokeAccessor = InvokeAccessor
+
+        if hasattr(stub, 'SerializeRequest'):
+            serializeRequest = stub.SerializeRequest
+
+            def SerializeRequest(mo, info, args):
+                request = serializeRequest(mo, info, args)
+                local.request_size = len(request)
+                return request
+            stub.SerializeRequest = SerializeRequest
+
+        if hasattr(stub, 'GetConnection'):
+            getConnection = stub.GetConnection
+
+            def GetConnection():
+                connection = getConnection()
+                if not getattr(connection, '_vsadminProfiled', False):
+                    connection._vsadminProfiled = True
+                    connection.getresponse = profiler.wrap_getresponse(connection.getresponse)
+                return connection
+            stub.GetConnection = GetConnection
+
+    def wrap_getresponse(self, getresponse):
+        local = self.local
+
+        def wrapper(*args, **kwargs):
+            response = getresponse(*args, **kwargs)
+            read = response.read
+            local.response_size = 0
+
+            def counting_read(*args, **kwargs):
+                data = read(*args, **kwargs)
+                local.response_size = (local.response_size or 0) + len(data)
+                return data
+            response.read = counting_read
+            return response
+        return wrapper
+
+    def record(self, label, method, mo, started, duration, request_size, response_size):
+        functions = caller_functions()
+        event = {'service': label,
+                 'method': method,
+                 'type': getattr(mo, '_wsdlName', type(mo).__name__),
+                 'start': started,
+                 'duration': duration,
+                 'request_size': request_size,
+                 'response_size': response_size,
+                 'function': functions[0] if functions else '-',
+                 'stack': functions,
+                 'thread': threading.current_thread().ident}
+        with self.lock:
+            self.events.append(event)
+
+    def summary(self):
+        """Return the summary tables as text
+
+        :rtype: str
+        """
+        def table(title, key):
+            rows = collections.OrderedDict()
+            for event in self.events:
+                row = rows.setdefault(key(event), [0, 0.0, 0, 0])
+                row[0] += 1
+                row[1] += event['duration']
+                row[2] += event['request_size'] or 0
+                row[3] += event['response_size'] or 0
+            lines = ['{:<58} {:>6} {:>10} {:>9} {:>11} {:>11}'.format(title, 'calls', 'total ms', 'avg ms',
+                                                                       'sent', 'received')]
+            for name, (calls, duration, sent, received) in sorted(rows.items(), key=lambda item: -item[1][1]):
+                lines.append('{:<58} {:>6} {:>10.1f} {:>9.1f} {:>11} {:>11}'.format(name[:58], calls, duration * 1000,
+                                                                                     duration * 1000 / calls,
+                                                                                     sent, received))
+            return lines
+
+        with self.lock:
+            total = sum(event['duration'] for event in self.events)
+            lines = table('service method (object type)',
+                          lambda event: '{} {} ({})'.format(event['service'], event['method'], event['type']))
+            lines.append('')
+            lines.extend(table('vsadmin function', lambda event: event['function']))
+            lines.append('')
+            lines.append('{} round trip(s), {:.1f} ms in SOAP calls, {:.1f} ms wall time'.format(
+                len(self.events), total * 1000, (time.time() - self.started) * 1000))
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """Write the calls as Chrome trace events (chrome://tracing, Perfetto)
+
+        :param path: The JSON file to write
+        :type path: str
+        """
+        with self.lock:
+            events = [{'name': '{} {}'.format(event['method'], event['type']),
+                       'cat': event['service'],
+                       'ph': 'X',
+                       'ts': (event['start'] - self.started) * 1e6,
+                       'dur': event['duration'] * 1e6,
+                       'pid': os.getpid(),
+                       'tid': event['thread'],
+                       'args': {'function': event['function'],
+                                'stack': event['stack'],
+                                'request_size': event['request_size'],
+                                'response_size': event['response_size']}}
+                      for event in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+import json
+import sys
+
+
+class bcolors(object):
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+# Latency in ms starting from which the value is highlighted
+LATENCY_THRESHOLD = 25
+
+INDENT = "                     "
+
+OUTPUT_FORMATS = ('text', 'json', 'ndjson')
+
+# Statistics vsadmin top can rank the virtual machines by
+TOP_METRICS = ('latency', 'iops', 'balloon', 'swap')
+
+
+class Report(object):
+    """Base class of the plain report objects"""
+    __slots__ = ()
+
+    def as_dict(self):
+        """Return the report as JSON serializable values
+
+        :rtype: dict
+        """
+        result = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                value = [item.as_dict() if isinstance(item, Report) else item for item in value]
+            elif isinstance(value, Report):
+                value = value.as_dict()
+            result[name] = value
+        return result
+
+
+class StoragePolicyReport(Report):
+    """Plain copy of a VMware Storage Policy profile"""
+    __slots__ = ('name', 'description', 'capabilities')
+
+    def __init__(self, name, description=None, capabilities=None):
+        self.name = name
+        self.description = description
+        self.capabilities = capabilities or []
+
+    @classmethod
+    def from_profile(cls, profile):
+        capabilities = []
+        if hasattr(profile.constraints, 'subProfiles'):
+            for subprofile in profile.constraints.subProfiles:
+                for capability in subprofile.capability:
+                    for constraint in capability.constraint:
+                        if hasattr(constraint, 'propertyInstance'):
+                            for propertyInstance in constraint.propertyInstance:
+                                capabilities.append((propertyInstance.id, propertyInstance.value))
+        return cls(profile.name, profile.description, capabilities)
+
+
+class VsanStatsReport(Report):
+    """vSAN performance averages of a virtual machine or virtual disk
+
+    IOPS, throughput in KB/s, latency in ms and congestion; a field is None
+    when vSAN returned no samples for it.
+    """
+    __slots__ = ('iops_read', 'iops_write', 'throughput_read', 'throughput_write',
+                 'latency_read', 'latency_write', 'congestion_read', 'congestion_write')
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @classmethod
+    def from_query(cls, vsanPerfQuery, entity_ref_id):
+        """Build the report from the samples of a VsanPerfQuery
+
+        :param vsanPerfQuery: The executed query
+        :type vsanPerfQuery: vsadmin.tools.vsanPerfQuery.VsanPerfQuery
+        :param entity_ref_id: The vSAN performance entity
+        :type entity_ref_id: str
+        """
+        values = dict((name, vsanPerfQuery.average(entity_ref_id, label))
+                      for name, label in vsanPerfQuery.metrics.items())
+        # vSAN reports throughput in bytes/s and latency in microseconds
+        for name, scale in (('throughput_read', 1024), ('throughput_write', 1024),
+                            ('latency_read', 1000), ('latency_write', 1000)):
+            if values.get(name) is not None:
+                values[name] /= scale
+        return cls(**values)
+
+
+class DiskReport(Report):
+    """Plain values describing one virtual disk of a virtual machine"""
+    __slots__ = ('key', 'label', 'capacity_kb', 'thin', 'file_name', 'datastore_type',
+                 'storage_policies', 'vsan_stats',
+                 'vdisk_io_read', 'vdisk_io_write', 'vdisk_latency_read', 'vdisk_latency_write',
+                 'datastore_io_read', 'datastore_io_write', 'datastore_latency_read', 'datastore_latency_write')
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @property
+    def is_vsan(self):
+        return self.datastore_type == 'vsan'
+
+
+class TopReport(Report):
+    """Statistics of one virtual machine ranked by vsadmin top
+
+    ``iops`` is summed and ``latency`` (ms) is the worst of all virtual
+    disks, ``balloon`` and ``swap`` are in MB. Fields are None when the
+    virtual machine returned no samples.
+    """
+    __slots__ = ('moref', 'name') + TOP_METRICS
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+
+class NicReport(Report):
+    """Plain values describing one guest network adapter"""
+    __slots__ = ('network', 'connected', 'mac', 'ips')
+
+    def __init__(self, network, connected, mac, ips):
+        self.network = network
+        self.connected = connected
+        self.mac = mac
+        self.ips = ips
+
+
+class VMReport(Report):
+    """Plain values describing a virtual machine, ready to be rendered
+
+    Statistics fields are None unless they were collected (verbose mode on a
+    powered on virtual machine, see :attr:`has_stats`).
+    """
+    __slots__ = ('moref', 'instance_uuid', 'name', 'guest_full_name', 'power_state',
+                 'tools_running_status', 'tools_status', 'tools_version_status', 'tools_version',
+                 'cluster', 'host', 'folder', 'num_cpu', 'memory_mb', 'memory_balloon_mb', 'memory_swapped_mb',
+                 'vmx_path', 'storage_policies', 'vsan_stats', 'disks', 'nics', 'has_ip_stack', 'gateways',
+                 'guest_hostname', 'dns_servers', 'search_domain', 'last_network_info', 'question',
+                 'annotation', 'has_stats', 'verbose')
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+        if self.disks is None:
+            self.disks = []
+        if self.nics is None:
+            self.nics = []
+
+    def as_dict(self):
+        result = Report.as_dict(self)
+        # Only tells how the text output was rendered
+        del result['verbose']
+        return result
+
+
+def colorize(value, color):
+    return "{}{}{}".format(color, value, bcolors.ENDC)
+
+
+def format_number(value, precision=0):
+    # Statistics vCenter returned no sample for are shown as n/a, not as 0
+    return "n/a" if value is None else "{:.{}f}".format(value, precision)
+
+
+def is_shown_nonzero(value, precision):
+    # Only highlight what does not print as zero
+    return value is not None and round(value, precision) > 0
+
+
+def format_latency(value):
+    if value is None or value < LATENCY_THRESHOLD:
+        return format_number(value)
+    return colorize(format_number(value), bcolors.FAIL)
+
+
+def render_vsan_stats(stats):
+    return ('vSAN: IORead-{}, IOWrite-{}, Throughput Read-{} KB/s, Throughput Write-{} KB/s, '
+            'Latency Read-{} ms, Latency Write-{} ms, Congestion Read-{}, Congestion Write-{}'.format(format_number(stats.iops_read),
+                                                                                                   format_number(stats.iops_write),
+                                                                                                   format_number(stats.throughput_read),
+                                                                                                   format_number(stats.throughput_write),
+                                                                                                   format_latency(stats.latency_read),
+                                                                                                   format_latency(stats.latency_write),
+                                                                                                   format_number(stats.congestion_read),
+                                                                                                   format_number(stats.congestion_write)))
+
+
+def render_storage_policies(policies, verbose=False):
+    result = ""
+    if len(policies) > 0:
+        for policy in policies:
+            result += "Name: {} \r\n".format(policy.name)
+            if verbose:
+                result += "                                     Description: {} \r\n".format(policy.description)
+                for propertyId, propertyValue in policy.capabilities:
+                    result += "                                     Parameter: {} Value: {}\r\n".format(propertyId,
+                                                                                                    propertyValue)
+    else:
+        result += "Name: Datastore Default \r\n"
+    return result
+
+
+def render_disk(disk, has_stats):
+    if not has_stats:
+        if not disk.is_vsan:
+            return ('Name: {} \r\n'
+                    '                     Size: {:.1f} GB \r\n'
+                    '                     Thin: {} \r\n'
+                    '                     File: {}'.format(disk.label,
+                                                           disk.capacity_kb / 1024 / 1024,
+                                                           disk.thin,
+                                                           disk.file_name))
+        return ('Name: {} \r\n'
+                '                     Size: {:.1f} GB \r\n'
+                '                     Thin: {} \r\n'
+                '                     File: {} \r\n'
+                '                     Storage Policy: {}'.format(disk.label,
+                                                                 disk.capacity_kb / 1024 / 1024,
+                                                                 disk.thin,
+                                                                 disk.file_name,
+                                                                 render_storage_policies(disk.storage_policies, verbose=False)))
+    if not disk.is_vsan:
+        return ('Name: {} \r\n'
+                '                     Size: {:.1f} GB \r\n'
+                '                     Thin: {} \r\n'
+                '                     File: {}\r\n'
+                '                     VirtualDisk: IORead-{}, IOWrite-{}, Latency Read-{} ms, Latency Write-{} ms \r\n'
+                '                     Datastore: IORead-{}, IOWrite-{}, Latency Read-{} ms, Latency Write-{} ms'.format(disk.label,
+                                                                                                                                disk.capacity_kb / 1024 / 1024,
+                                                                                                                                disk.thin,
+                                                                                                                                disk.file_name,
+                                                                                                                                format_number(disk.vdisk_io_read),
+                                                                                                                                format_number(disk.vdisk_io_write),
+                                                                                                                                format_latency(disk.vdisk_latency_read),
+                                                                                                                                format_latency(disk.vdisk_latency_write),
+                                                                                                                                format_number(disk.datastore_io_read),
+                                                                                                                                format_number(disk.datastore_io_write),
+                                                                                                                                format_latency(disk.datastore_latency_read),
+                                                                                                                                format_latency(disk.datastore_latency_write)))
+    result = ('Name: {} \r\n'
+              '                     Size: {:.1f} GB \r\n'
+              '                     Thin: {} \r\n'
+              '                     File: {} \r\n'
+              '                     Storage Policy: {}'
+              '                     VirtualDisk: IORead-{}, IOWrite-{}, Latency Read-{} ms, Latency Write-{} ms \r\n'.format(disk.label,
+                                                                                                                                     disk.capacity_kb / 1024 / 1024,
+                                                                                                                                     disk.thin,
+                                                                                                                                     disk.file_name,
+                                                                                                                                     render_storage_policies(disk.storage_policies, verbose=True),
+                                                                                                                                     format_number(disk.vdisk_io_read),
+                                                                                                                                     format_number(disk.vdisk_io_write),
+                                                                                                                                     format_latency(disk.vdisk_latency_read),
+                                                                                                                                     format_latency(disk.vdisk_latency_write)))
+    if disk.vsan_stats is not None:
+        result += INDENT + render_vsan_stats(disk.vsan_stats)
+    return result
+
+
+def render_vm_report(report, server):
+    """Render a VMReport as the colored text shown by vsadmin search
+
+    :param report: The virtual machine report
+    :type report: VMReport
+    :param server: The vCenter address used to build the VMRC link
+    :type server: str
+    :rtype: str
+    """
+    lines = []
+    if report.has_stats:
+        memoryBalloon = format_number(report.memory_balloon_mb, 1)
+        if is_shown_nonzero(report.memory_balloon_mb, 1):
+            memoryBalloon = colorize(memoryBalloon, bcolors.WARNING)
+        memorySwapped = format_number(report.memory_swapped_mb, 1)
+        if is_shown_nonzero(report.memory_swapped_mb, 1):
+            memorySwapped = colorize(memorySwapped, bcolors.FAIL)
+        memory = "{} MB ({:.1f} GB) [Ballooned: {} MB, Swapped: {} MB]".format(report.memory_mb, (float(report.memory_mb) / 1024), memoryBalloon, memorySwapped)
+    else:
+        memory = "{} MB ({:.1f} GB)".format(report.memory_mb, (float(report.memory_mb) / 1024))
+
+    guestToolsRunningStatus = colorize("Running", bcolors.OKGREEN) if report.tools_running_status == "guestToolsRunning" else colorize("Not running", bcolors.FAIL)
+    guestToolsStatus = colorize("OK", bcolors.OKGREEN) if report.tools_status == "toolsOk" else colorize("Need Attention", bcolors.FAIL)
+    guestToolsVersionStatus = colorize("Current", bcolors.OKGREEN) if report.tools_version_status == "guestToolsCurrent" else colorize("Need upgrade", bcolors.WARNING)
+    powerStatus = colorize(report.power_state, bcolors.OKGREEN) if report.power_state == "poweredOn" else colorize(report.power_state, bcolors.FAIL)
+
+    lines.append("UUID               : {}".format(report.instance_uuid))
+    lines.append("Name               : {}".format(report.name))
+    lines.append("VMRC               : vmrc://{}:443/?moid={}".format(server, report.moref))
+    lines.append("Guest              : {}".format(report.guest_full_name))
+    lines.append("State              : {}".format(powerStatus))
+    lines.append("Guest Tools Status : Status: {} | Version Status: {} | Version: {} | Health: {}".format(guestToolsRunningStatus, guestToolsVersionStatus, report.tools_version, guestToolsStatus))
+    lines.append("Cluster            : {}".format(report.cluster))
+    lines.append("Host               : {}".format(report.host))
+    lines.append("Folder             : {}".format(report.folder))
+    lines.append("Number of vCPUs    : {}".format(report.num_cpu))
+    lines.append("Memory             : {}".format(memory))
+    lines.append("VM .vmx Path       : {}".format(report.vmx_path))
+
+    if report.storage_policies is not None:
+        lines.append(INDENT + "Storage Policy: {}".format(render_storage_policies(report.storage_policies, verbose=report.verbose)))
+    if report.vsan_stats is not None:
+        lines.append(INDENT + render_vsan_stats(report.vsan_stats))
+
+    lines.append("Virtual Disks      :")
+    first = True
+    for disk in report.disks:
+        if first:
+            first = False
+        else:
+            lines.append("")
+        lines.append(INDENT + render_disk(disk, report.has_stats))
+
+    if report.nics:
+        lines.append("Network            : ")
+        for nic in report.nics:
+            lines.append(INDENT + "Name: {}".format(nic.network))
+            if nic.connected is not None:
+                lines.append(INDENT + "Connected: {}".format(nic.connected))
+            lines.append(INDENT + "Mac: {}".format(nic.mac))
+            for ip in nic.ips:
+                lines.append(INDENT + "IP: {}".format(ip))
+            lines.append("")
+    if report.has_ip_stack:
+        for gateway in report.gateways:
+            lines.append(INDENT + "Default GW: {}".format(gateway))
+        lines.append("")
+        lines.append("Guest Hostname     : {}".format(report.guest_hostname))
+        lines.append("DNS                :")
+        for dns in report.dns_servers:
+            lines.append(INDENT + "Address: {}".format(dns))
+        lines.append(INDENT + "Search Domain: {}".format(report.search_domain))
+
+    if report.last_network_info:
+        lines.append("Last Network Info  : {}".format(report.last_network_info))
+
+    if report.question is not None:
+        lines.append("Question  : {}".format(report.question))
+
+    if report.annotation:
+        lines.append("Notes              : {}".format(report.annotation))
+
+    return "\n".join(lines)
+
+
+def render_top_header():
+    return "{:<40} {:>10} {:>12} {:>12} {:>12}".format("Name", "IOPS", "Latency ms", "Balloon MB", "Swap MB")
+
+
+def render_top_report(report):
+    """Render a TopReport as one row of the vsadmin top table
+
+    :param report: The virtual machine statistics
+    :type report: TopReport
+    :rtype: str
+    """
+    def number(value, width, precision=0):
+        return "{:>{}}".format("-", width) if value is None else "{:>{}.{}f}".format(value, width, precision)
+
+    latency = number(report.latency, 12)
+    if report.latency is not None and report.latency >= LATENCY_THRESHOLD:
+        latency = colorize(latency, bcolors.FAIL)
+    balloon = number(report.balloon, 12, 1)
+    if is_shown_nonzero(report.balloon, 1):
+        balloon = colorize(balloon, bcolors.WARNING)
+    swap = number(report.swap, 12, 1)
+    if is_shown_nonzero(report.swap, 1):
+        swap = colorize(swap, bcolors.FAIL)
+    return "{:<40} {} {} {} {}".format(report.name[:40], number(report.iops, 10), latency, balloon, swap)
+
+
+def write_reports(reports, server, output='text', stream=None, render=None):
+    """Write reports one by one as soon as they are produced
+
+    :param reports: The reports, usually a generator
+    :type reports: iterable of Report
+    :param server: The vCenter address used to build the VMRC link
+    :type server: str
+    :param output: One of :data:`OUTPUT_FORMATS`
+    :type output: str
+    :param stream: Where to write to (default is stdout)
+    :param render: Function rendering a report as text (default is
+        :func:`render_vm_report`)
+    """
+    if stream is None:
+        stream = sys.stdout
+    if render is None:
+        def render(report):
+            return render_vm_report(report, server)
+    if output == 'json':
+        separator = '[\n'
+        for report in reports:
+            stream.write(separator + json.dumps(report.as_dict(), default=str))
+            stream.flush()
+            separator = ',\n'
+        stream.write('[]\n' if separator == '[\n' else '\n]\n')
+    elif output == 'ndjson':
+        for report in reports:
+            stream.write(json.dumps(report.as_dict(), default=str) + '\n')
+            stream.flush()
+    else:
+        for report in reports:
+            stream.write(render(report) + '\n')
+            stream.flush()
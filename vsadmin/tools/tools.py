@@ -1,27 +1,55 @@
 # -*- coding: utf-8 -*-
 import atexit
+import collections
 import re
 import sys
 import ssl
-import requests
-import vsadmin.tools.vsanapiutils
-import vsadmin.tools.vsanmgmtObjects
-import vsadmin.tools.vsanStoragePolicy
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-from pyVmomi import pbm, vim
-from pyVim.connect import SmartConnect, SmartConnectNoSSL, Disconnect
+import threading
+import time
+import vsadmin.tools.cache
+import vsadmin.tools.inventory
+import vsadmin.tools.inventoryIndex
+import vsadmin.tools.macIndex
+import vsadmin.tools.matcher
+import vsadmin.tools.perfQuery
+import vsadmin.tools.profiler
+import vsadmin.tools.report
+from pyVmomi import pbm, vim, vmodl
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 
-class bcolors(object):
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
+MEMORY_COUNTERS = ('mem.vmmemctl.average',
+                   'mem.swapped.average')
+
+VIRTUALDISK_COUNTERS = ('virtualDisk.numberReadAveraged.average',
+                        'virtualDisk.numberWriteAveraged.average',
+                        'virtualDisk.totalReadLatency.average',
+                        'virtualDisk.totalWriteLatency.average')
+
+DATASTORE_COUNTERS = ('datastore.numberReadAveraged.average',
+                      'datastore.numberWriteAveraged.average',
+                      'datastore.totalReadLatency.average',
+                      'datastore.totalWriteLatency.average')
+
+VM_REPORT_PROPERTIES = ['summary.config',
+                        'parent',
+                        'summary.runtime.powerState',
+                        'summary.runtime.host',
+                        'summary.runtime.question',
+                        'customValue',
+                        'guest.toolsRunningStatus',
+                        'guest.toolsStatus',
+                        'guest.toolsVersionStatus',
+                        'guest.toolsVersion',
+                        'guest.net',
+                        'guest.ipStack',
+                        'config.hardware.device']
+
+DATASTORE_PROPERTIES = ['name', 'summary.type', 'summary.url', 'info']
+
+# Number of virtual machines collected with one property retrieve and one QueryPerf
+REPORT_BATCH_SIZE = 20
 
 
 class vCenterException(RuntimeError):
@@ -52,59 +80,230 @@ class NetworkCheck(object):
                 return False
         return True
 
-    @staticmethod
-    def checkMAC(mac):
-        if re.match('[0-9a-f]{2}([:])[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$',
-                    mac.lower()):
-            return True
-        else:
-            return False
+
+class lazyproperty(object):
+    """Compute an attribute on first access and memoize it on the instance"""
+
+    def __init__(self, func):
+        self.func = func
+        self.lock = threading.RLock()
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        with self.lock:
+            # Another thread may have initialized it while we were waiting
+            if self.__name__ in instance.__dict__:
+                return instance.__dict__[self.__name__]
+            startTime = time.time()
+            value = self.func(instance)
+            instance.__dict__[self.__name__] = value
+        if getattr(instance, 'debug', False):
+            sys.stderr.write("DEBUG: initialized {} in {:.3f}s\n".format(self.__name__, time.time() - startTime))
+        return value
 
 
 class vCenter(object):
-    def __init__(self, server, username, password, disable_ssl_verification):
+    def __init__(self, server, username, password, disable_ssl_verification, session_cache=False, debug=False,
+                 use_index=False, service_instance=None):
         self.server = server
         self.username = username
         self.password = password
         self.disable_ssl_verification = disable_ssl_verification
+        self.session_cache = session_cache
+        self.debug = debug
+        self.use_index = use_index
+        self.perf_dict_cached = False
         self.serviceInstance = None
-        try:
-            if disable_ssl_verification:
-                self.serviceInstance = SmartConnectNoSSL(host=self.server,
-                                                         user=self.username,
-                                                         pwd=self.password)
-            else:
-                self.serviceInstance = SmartConnect(host=self.server,
-                                                    user=self.username,
-                                                    pwd=self.password)
-            atexit.register(Disconnect, self.serviceInstance)
-        except IOError as e:
-            print(e)
-            pass
+        self.perf_round_trips = 0
+        self.perf_round_trips_saved = 0
+        self.mac_index_reloadable = False
+        self.stats_lock = threading.Lock()
+        if service_instance is not None:
+            # Already connected, e.g. to the offline benchmark stand-in
+            self.serviceInstance = service_instance
+        elif self.session_cache:
+            self.serviceInstance = self.resume_session()
+        if not self.serviceInstance:
+            self.serviceInstance = self.login()
         if not self.serviceInstance:
             raise SystemExit("Unable to connect to host with supplied info.")
-
-        self.pbm_content = vsadmin.tools.vsanStoragePolicy.PbmConnect(self.serviceInstance._stub,
-                                                                      self.disable_ssl_verification)
-        self.pm = self.pbm_content.profileManager
-
-        self.lastnetworkinfokey = self.get_customfield_key('LastNetworkInfo')
-
-        self.vchtime = self.serviceInstance.CurrentTime()
-
+        vsadmin.tools.profiler.instrument(self.serviceInstance._stub, 'vim')
+
+    @lazyproperty
+    def pbm_content(self):
+        import vsadmin.tools.vsanStoragePolicy
+        return vsadmin.tools.vsanStoragePolicy.PbmConnect(self.serviceInstance._stub,
+                                                          self.disable_ssl_verification)
+
+    @lazyproperty
+    def pm(self):
+        return self.pbm_content.profileManager
+
+    @lazyproperty
+    def lastnetworkinfokey(self):
+        return self.get_customfield_key('LastNetworkInfo')
+
+    @lazyproperty
+    def historical_intervals(self):
+        return self.serviceInstance.content.perfManager.historicalInterval
+
+    @lazyproperty
+    def vchtime(self):
+        return self.serviceInstance.CurrentTime()
+
+    @lazyproperty
+    def vsanPerfSystem(self):
+        # Registers the vSAN types, only done once vSAN is actually used
+        import vsadmin.tools.vsanapiutils
         apiVersion = vsadmin.tools.vsanapiutils.GetLatestVmodlVersion(self.server)
         vcMos = vsadmin.tools.vsanapiutils.GetVsanVcMos(self.serviceInstance._stub, version=apiVersion)
-
-        self.vsanPerfSystem = vcMos['vsan-performance-manager']
-
+        # All vSAN managed objects share the stub built by _GetVsanStub
+        vsadmin.tools.profiler.instrument(vcMos['vsan-performance-manager']._stub, 'vsan')
+        return vcMos['vsan-performance-manager']
+
+    @lazyproperty
+    def perf_dict(self):
+        about = self.serviceInstance.content.about
+        perf_dict = vsadmin.tools.cache.load_perf_counters(about.instanceUuid, about.build)
+        self.perf_dict_cached = perf_dict is not None
+        if perf_dict is None:
+            perf_dict = self.fetch_perf_dict(about)
+        return perf_dict
+
+    def fetch_perf_dict(self, about=None):
         # Get all the performance counters
-        self.perf_dict = {}
+        perf_dict = {}
         perfList = self.serviceInstance.content.perfManager.perfCounter
         for counter in perfList:
             counter_full = "{}.{}.{}".format(counter.groupInfo.key,
                                              counter.nameInfo.key,
                                              counter.rollupType)
-            self.perf_dict[counter_full] = counter.key
+            perf_dict[counter_full] = counter.key
+        if about is None:
+            about = self.serviceInstance.content.about
+        vsadmin.tools.cache.save_perf_counters(about.instanceUuid, about.build, perf_dict)
+        self.perf_dict_cached = False
+        return perf_dict
+
+    @lazyproperty
+    def inventory_index(self):
+        index = vsadmin.tools.inventoryIndex.InventoryIndex(self.serviceInstance)
+        index.refresh()
+        return index
+
+    @lazyproperty
+    def datastores(self):
+        # All datastores by moId, loaded with a single property retrieve
+        datastores = {}
+        for record in vsadmin.tools.inventory.collect(self.serviceInstance, vim.Datastore, DATASTORE_PROPERTIES):
+            vmfs = getattr(record['info'], 'vmfs', None)
+            if vmfs is not None:
+                uuid = vmfs.uuid
+            else:
+                # NFS and vVol datastores are identified by the volume id in their URL
+                match = re.match(r'.*/volumes/([^/]+)/?$', record['summary.url'] or '')
+                uuid = match.group(1) if match else None
+            datastores[record['obj']._moId] = {'obj': record['obj'],
+                                               'name': record['name'],
+                                               'type': record['summary.type'],
+                                               'uuid': uuid}
+        return datastores
+
+    @lazyproperty
+    def mac_index(self):
+        # A PropertyCollector can not return single fields of the device array,
+        # the hardware config is streamed and only the MAC addresses are kept
+        records = vsadmin.tools.inventory.collect(self.serviceInstance, vim.VirtualMachine, ['config.hardware.device'])
+        return vsadmin.tools.macIndex.MacIndex.from_records(records)
+
+    @lazyproperty
+    def folders(self):
+        # Name and parent moId of every folder, loaded with a single property retrieve
+        return dict((record['obj']._moId, (record['name'], record['parent']._moId if record['parent'] is not None else None))
+                    for record in vsadmin.tools.inventory.collect(self.serviceInstance, vim.Folder, ['name', 'parent']))
+
+    def get_datastore_info(self, datastore):
+        info = self.datastores.get(datastore._moId)
+        if info is None:
+            # The datastore was added after the index was loaded
+            self.__dict__.pop('datastores', None)
+            info = self.datastores[datastore._moId]
+        return info
+
+    def find_vms_by_mac(self, mac):
+        """Return the virtual machines with a MAC address or MAC prefix
+
+        :param mac: A normalized MAC address or prefix
+        :type mac: str
+        :rtype: list
+        """
+        found = self.mac_index.find(mac)
+        if not found and self.mac_index_reloadable:
+            # The index was loaded by a previous request (vsadmin serve), the
+            # MAC address may belong to a virtual machine created since then
+            self.mac_index_reloadable = False
+            self.__dict__.pop('mac_index', None)
+            found = self.mac_index.find(mac)
+        return found
+
+    def reset_request_state(self):
+        # A long-lived connection (vsadmin serve) must not reuse the vCenter
+        # time of a previous request. The inventory caches are kept warm,
+        # lookups missing in them reload them.
+        self.__dict__.pop('vchtime', None)
+        self.perf_round_trips = 0
+        self.perf_round_trips_saved = 0
+        self.mac_index_reloadable = 'mac_index' in self.__dict__
+        if 'inventory_index' in self.__dict__:
+            self.inventory_index.refresh()
+
+    def get_vm_by_moref(self, moref):
+        return vim.VirtualMachine(moref, self.serviceInstance._stub)
+
+    def login(self):
+        # pyVim.connect imports requests, which is slow to import
+        from pyVim.connect import SmartStubAdapter, Disconnect
+        serviceInstance = None
+        try:
+            # The steps of SmartConnect, with the stub instrumented before the
+            # RetrieveServiceContent and Login round trips like in resume_session
+            sslContext = ssl._create_unverified_context() if self.disable_ssl_verification else None
+            stub = SmartStubAdapter(host=self.server, sslContext=sslContext)
+            vsadmin.tools.profiler.instrument(stub, 'vim')
+            serviceInstance = vim.ServiceInstance('ServiceInstance', stub)
+            serviceInstance.RetrieveContent().sessionManager.Login(self.username, self.password, None)
+        except IOError as e:
+            serviceInstance = None
+            print(e)
+            pass
+        if serviceInstance:
+            if self.session_cache:
+                # Keep the session open on exit so the next run can reuse it
+                vsadmin.tools.cache.save_session(self.server, self.username, serviceInstance._stub.cookie)
+            else:
+                atexit.register(Disconnect, serviceInstance)
+        return serviceInstance
+
+    def resume_session(self):
+        from pyVim.connect import SmartStubAdapter
+        cookie = vsadmin.tools.cache.load_session(self.server, self.username)
+        if not cookie:
+            return None
+        try:
+            sslContext = ssl._create_unverified_context() if self.disable_ssl_verification else None
+            stub = SmartStubAdapter(host=self.server, sslContext=sslContext)
+            stub.cookie = cookie
+            vsadmin.tools.profiler.instrument(stub, 'vim')
+            serviceInstance = vim.ServiceInstance('ServiceInstance', stub)
+            if serviceInstance.RetrieveContent().sessionManager.currentSession is not None:
+                return serviceInstance
+        except (IOError, vim.fault.NotAuthenticated):
+            pass
+        vsadmin.tools.cache.drop_session(self.server, self.username)
+        return None
 
     def get_metric_with_instance(self, content, vm, vchtime, interval):
         perfManager = content.perfManager
@@ -113,76 +312,87 @@ class vCenter(object):
         metricId = perfManager.QueryAvailablePerfMetric(vm, startTime, endTime, interval)
         return metricId
 
-    def get_virtualdisk_scsi(self, vm, virtualdisk):
+    def get_virtualdisk_scsi(self, vm, virtualdisk, devices=None):
         controllerID = virtualdisk.controllerKey
         unitNumber = virtualdisk.unitNumber
-        vm_hardware = vm.config.hardware
-        for vm_hardware_device in vm_hardware.device:
+        if devices is None:
+            devices = vm.config.hardware.device
+        for vm_hardware_device in devices:
             if vm_hardware_device.key == controllerID:
                 busNumber = vm_hardware_device.busNumber
         return "scsi{}:{}".format(busNumber, unitNumber)
 
-    def build_vsan_perf_query(self, content, vchtime, counterId, instance, vm, interval):
-        perfManager = content.perfManager
-        metricId = vim.PerformanceManager.MetricId(counterId=counterId,
-                                                   instance=instance)
+    def build_perf_query(self, content, vchtime, interval):
         startTime = vchtime - timedelta(minutes=(interval + 1))
         endTime = vchtime - timedelta(minutes=1)
-        query = vim.PerformanceManager.QuerySpec(intervalId=20,
-                                                 entity=vm,
-                                                 metricId=[metricId],
-                                                 startTime=startTime,
-                                                 endTime=endTime)
-        perfResults = perfManager.QueryPerf(querySpec=[query])
-        if perfResults:
-            return perfResults
-        else:
-            print("ERROR: Performance results empty."
-                  "TIP: Check time drift on source and vCenter server")
-            print("Troubleshooting info:")
-            print("vCenter/host date and time: {}".format(vchtime))
-            print("Start perf counter time   :  {}".format(startTime))
-            print("End perf counter time     :  {}".format(endTime))
-            print(query)
-            sys.exit(1)
-
-    def build_perf_query(self, content, vchtime, counterId, instance, vm, interval):
-        perfManager = content.perfManager
-        metricId = vim.PerformanceManager.MetricId(counterId=counterId,
-                                                   instance=instance)
-        startTime = vchtime - timedelta(minutes=(interval + 1))
-        endTime = vchtime - timedelta(minutes=1)
-        query = vim.PerformanceManager.QuerySpec(intervalId=20,
-                                                 entity=vm,
-                                                 metricId=[metricId],
-                                                 startTime=startTime,
-                                                 endTime=endTime)
-        perfResults = perfManager.QueryPerf(querySpec=[query])
+        window = interval * 60
+        # The historical intervals are only fetched for windows realtime statistics do not cover
+        historicalIntervals = self.historical_intervals if window > vsadmin.tools.perfQuery.REALTIME_RETENTION else []
+        intervalId, maxSample = vsadmin.tools.perfQuery.plan_interval(window, historicalIntervals)
+        if self.debug:
+            sys.stderr.write("DEBUG: querying {} minute(s) of stats with intervalId {}\n".format(interval, intervalId))
+        return vsadmin.tools.perfQuery.PerfQuery(content.perfManager, startTime, endTime,
+                                                 interval_id=intervalId, max_sample=maxSample)
+
+    def build_vsan_perf_query(self, interval):
+        import vsadmin.tools.vsanPerfQuery
+        startTime = self.vchtime - timedelta(minutes=(interval + 1))
+        endTime = self.vchtime - timedelta(minutes=1)
+        return vsadmin.tools.vsanPerfQuery.VsanPerfQuery(self.vsanPerfSystem, startTime, endTime)
+
+    def run_vsan_perf_query(self, vsan_perf_query):
+        try:
+            vsan_perf_query.execute()
+        except vmodl.MethodFault as e:
+            # The vSAN performance service may be turned off on the cluster
+            sys.stderr.write("WARNING: vSAN performance statistics unavailable: {}\n".format(e.msg))
+        with self.stats_lock:
+            self.perf_round_trips += vsan_perf_query.round_trips
+
+    def run_perf_query(self, perf_query):
+        perfResults = perf_query.execute()
+        with self.stats_lock:
+            self.perf_round_trips += perf_query.round_trips
+            self.perf_round_trips_saved += perf_query.round_trips_saved
         if perfResults:
             return perfResults
         else:
             print("ERROR: Performance results empty."
                   "TIP: Check time drift on source and vCenter server")
             print("Troubleshooting info:")
-            print("vCenter/host date and time: {}".format(vchtime))
-            print("Start perf counter time   :  {}".format(startTime))
-            print("End perf counter time     :  {}".format(endTime))
-            print(query)
+            print("vCenter/host date and time: {}".format(self.vchtime))
+            print("Start perf counter time   :  {}".format(perf_query.start_time))
+            print("End perf counter time     :  {}".format(perf_query.end_time))
+            print(perf_query.build_query_specs())
             sys.exit(1)
 
     def stat_check(self, perf_dict, counter_name):
+        if counter_name not in perf_dict and self.perf_dict_cached:
+            # The cached counter catalog may be stale, refresh it from vCenter
+            perf_dict.update(self.fetch_perf_dict())
         counter_key = perf_dict[counter_name]
         return counter_key
 
     def print_folder_tree(self, vm):
-        entity = vm
+        return self.get_folder_path(vm.parent)
+
+    def get_folder_path(self, folder):
+        """Return the path of a folder below the datacenter 'vm' folder
+
+        :param folder: The folder a virtual machine is placed in
+        :type folder: vim.Folder
+        :returns: The folder path, e.g. /Prod/Web
+        :rtype: str
+        """
+        if folder is not None and folder._moId not in self.folders:
+            # The folder was created after the tree was loaded
+            self.__dict__.pop('folders', None)
         folder_tree = []
-        while entity.parent.name != 'vm':
-            if isinstance(entity.parent, vim.Folder):
-                folder_tree = [entity.parent.name] + folder_tree
-            entity = entity.parent
-        folder_tree = "/" + "/".join(folder_tree)
-        return folder_tree
+        moId = folder._moId if folder is not None else None
+        while moId in self.folders and self.folders[moId][0] != 'vm':
+            name, moId = self.folders[moId]
+            folder_tree = [name] + folder_tree
+        return "/" + "/".join(folder_tree)
 
     @staticmethod
     def get_moref(obj):
@@ -197,344 +407,387 @@ class vCenter(object):
             return None
 
     def print_vm_info(self, vm, interval=20, verbose=False):
+        print(self.vm_info(vm, interval=interval, verbose=verbose))
+
+    def print_vms_info(self, vms, interval=20, verbose=False, jobs=1, output='text'):
+        reports = self.iter_vm_reports(vms, interval=interval, verbose=verbose, jobs=jobs)
+        vsadmin.tools.report.write_reports(reports, self.server, output=output)
+
+    def vm_info(self, vm, interval=20, verbose=False):
+        report = self.collect_vm_reports([vm], interval=interval, verbose=verbose)[0]
+        return vsadmin.tools.report.render_vm_report(report, self.server)
+
+    def iter_vm_reports(self, vms, interval=20, verbose=False, jobs=1, batch_size=REPORT_BATCH_SIZE):
+        if jobs > 1:
+            # Give every worker a batch of its own
+            batch_size = max(1, min(batch_size, -(-len(vms) // jobs)))
+        batches = [vms[i:i + batch_size] for i in range(0, len(vms), batch_size)]
+        if jobs <= 1 or len(batches) <= 1:
+            for batch in batches:
+                for report in self.collect_vm_reports(batch, interval=interval, verbose=verbose):
+                    yield report
+            return
+        # Let every worker keep its own connection to vCenter
+        self.serviceInstance._stub.poolSize = max(self.serviceInstance._stub.poolSize, jobs)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            # Keep only a few batches in flight so memory does not grow with the result size
+            pending = collections.deque()
+            for batch in batches:
+                pending.append(executor.submit(self.collect_vm_reports, batch, interval=interval, verbose=verbose))
+                if len(pending) >= 2 * jobs:
+                    for report in pending.popleft().result():
+                        yield report
+            while pending:
+                for report in pending.popleft().result():
+                    yield report
+
+    def get_host_info(self, records):
+        hosts = dict((record['summary.runtime.host']._moId, record['summary.runtime.host'])
+                     for record in records if record['summary.runtime.host'] is not None)
+        host_records = list(vsadmin.tools.inventory.collect_objects(self.serviceInstance, list(hosts.values()),
+                                                                    vim.HostSystem, ['name', 'parent']))
+        parents = dict((record['parent']._moId, record['parent']) for record in host_records if record['parent'] is not None)
+        parent_names = dict((record['obj']._moId, record['name'])
+                            for record in vsadmin.tools.inventory.collect_objects(self.serviceInstance, list(parents.values()),
+                                                                                  vim.ManagedEntity, ['name']))
+        return dict((record['obj']._moId, (record['name'],
+                                           parent_names.get(record['parent']._moId) if record['parent'] else None,
+                                           record['parent']))
+                    for record in host_records)
+
+    def get_storage_policies(self, pmRefs):
+        if not pmRefs:
+            # Nothing on vSAN, do not connect to the storage policy service
+            return {}
+        import vsadmin.tools.vsanStoragePolicy
+        # Two PBM calls for all the references instead of two per reference
+        profiles = vsadmin.tools.vsanStoragePolicy.GetStorageProfilesBatch(self.pm, pmRefs)
+        return dict((key, [vsadmin.tools.report.StoragePolicyReport.from_profile(profile) for profile in value])
+                    for key, value in profiles.items())
+
+    def stat_average(self, perfQuery, vm, counter_name, instance=""):
+        # The mean of the valid samples, None when vCenter returned none, e.g. for
+        # a counter above the statistics level of a historical interval
+        return perfQuery.reduce(vm, self.stat_check(self.perf_dict, counter_name), instance, how='mean')
+
+    def add_vm_stats(self, perfQuery, vm, disks):
+        """Register the memory, virtual disk and datastore counters of a virtual machine
+
+        :param perfQuery: The query to add the counters to
+        :type perfQuery: vsadmin.tools.perfQuery.PerfQuery
+        :param disks: The virtual disks planned by :meth:`collect_vm_reports`
+        :type disks: list of dict
+        """
+        for counter_name in MEMORY_COUNTERS:
+            perfQuery.add(vm, self.stat_check(self.perf_dict, counter_name))
+        for disk in disks:
+            for counter_name in VIRTUALDISK_COUNTERS:
+                perfQuery.add(vm, self.stat_check(self.perf_dict, counter_name), disk['scsi'])
+            if disk['uuid'] is not None:
+                for counter_name in DATASTORE_COUNTERS:
+                    perfQuery.add(vm, self.stat_check(self.perf_dict, counter_name), disk['uuid'])
+
+    def fill_vm_stats(self, report, vm, disks, perfQuery):
+        """Set the statistics registered by :meth:`add_vm_stats` on a report
+
+        :param report: The report of the virtual machine, its disks in the order of ``disks``
+        :type report: vsadmin.tools.report.VMReport
+        :param perfQuery: An executed query
+        :type perfQuery: vsadmin.tools.perfQuery.PerfQuery
+        """
+        # Memory Balloon and Swapped
+        balloon = self.stat_average(perfQuery, vm, 'mem.vmmemctl.average')
+        swapped = self.stat_average(perfQuery, vm, 'mem.swapped.average')
+        report.memory_balloon_mb = balloon / 1024 if balloon is not None else None
+        report.memory_swapped_mb = swapped / 1024 if swapped is not None else None
+        for disk, diskReport in zip(disks, report.disks):
+            # VirtualDisk Average IO and Latency
+            diskReport.vdisk_io_read = self.stat_average(perfQuery, vm, 'virtualDisk.numberReadAveraged.average', disk['scsi'])
+            diskReport.vdisk_io_write = self.stat_average(perfQuery, vm, 'virtualDisk.numberWriteAveraged.average', disk['scsi'])
+            diskReport.vdisk_latency_read = self.stat_average(perfQuery, vm, 'virtualDisk.totalReadLatency.average', disk['scsi'])
+            diskReport.vdisk_latency_write = self.stat_average(perfQuery, vm, 'virtualDisk.totalWriteLatency.average', disk['scsi'])
+            if disk['uuid'] is not None:
+                # Datastore Average IO and Latency
+                diskReport.datastore_io_read = self.stat_average(perfQuery, vm, 'datastore.numberReadAveraged.average', disk['uuid'])
+                diskReport.datastore_io_write = self.stat_average(perfQuery, vm, 'datastore.numberWriteAveraged.average', disk['uuid'])
+                diskReport.datastore_latency_read = self.stat_average(perfQuery, vm, 'datastore.totalReadLatency.average', disk['uuid'])
+                diskReport.datastore_latency_write = self.stat_average(perfQuery, vm, 'datastore.totalWriteLatency.average', disk['uuid'])
+
+    def collect_vm_reports(self, vms, interval=20, verbose=False, plans=None):
+        """Build the reports of a batch of virtual machines
+
+        :param plans: When a list is given, the vSphere statistics are not
+            fetched; ``(report, vm, disks)`` of every virtual machine with
+            statistics is appended to it instead, for the caller to fetch
+            them with :meth:`add_vm_stats` and :meth:`fill_vm_stats`
+        :type plans: list
+        :rtype: list of vsadmin.tools.report.VMReport
+        """
         statInt = interval
-        summary = vm.summary
-        disk_list = []
-        vm_hardware = vm.config.hardware
-
-        if summary.runtime.powerState == "poweredOn" and verbose:
-            # Memory Balloon
-            statMemoryBalloon = self.build_perf_query(self.serviceInstance.content, self.vchtime, (self.stat_check(self.perf_dict, 'mem.vmmemctl.average')), "", vm, statInt)
-            memoryBalloon = (float(sum(statMemoryBalloon[0].value[0].value) / 1024) / statInt)
-            memoryBalloon = "{:.1f}".format(memoryBalloon) if memoryBalloon <= 0 else "{}{:.1f}{}".format(bcolors.WARNING, memoryBalloon, bcolors.ENDC)
-
-            # Memory Swapped
-            statMemorySwapped = self.build_perf_query(self.serviceInstance.content, self.vchtime, (self.stat_check(self.perf_dict, 'mem.swapped.average')), "", vm, statInt)
-            memorySwapped = (float(sum(statMemorySwapped[0].value[0].value) / 1024) / statInt)
-            memorySwapped = "{:.1f}".format(memorySwapped) if memorySwapped <= 0 else "{}{:.1f}{}".format(bcolors.FAIL, memorySwapped, bcolors.ENDC)
-            memory = "{} MB ({:.1f} GB) [Ballooned: {} MB, Swapped: {} MB]".format(summary.config.memorySizeMB, (float(summary.config.memorySizeMB) / 1024), memoryBalloon, memorySwapped)
-        else:
-            memory = "{} MB ({:.1f} GB)".format(summary.config.memorySizeMB, (float(summary.config.memorySizeMB) / 1024))
-
-        for each_vm_hardware in vm_hardware.device:
-            if (each_vm_hardware.key >= 2000) and (each_vm_hardware.key < 3000):
-                if summary.runtime.powerState == "poweredOn" and verbose:
-                    # VirtualDisk Average IO
-                    statVirtualdiskIORead = self.build_perf_query(self.serviceInstance.content,
-                                                                  self.vchtime,
-                                                                  self.stat_check(self.perf_dict, 'virtualDisk.numberReadAveraged.average'),
-                                                                  self.get_virtualdisk_scsi(vm, each_vm_hardware),
-                                                                  vm,
-                                                                  statInt)
-                    VirtualdiskIORead = (float(sum(statVirtualdiskIORead[0].value[0].value)) / statInt)
-
-                    statVirtualdiskIOWrite = self.build_perf_query(self.serviceInstance.content,
-                                                                   self.vchtime,
-                                                                   self.stat_check(self.perf_dict, 'virtualDisk.numberWriteAveraged.average'),
-                                                                   self.get_virtualdisk_scsi(vm, each_vm_hardware),
-                                                                   vm,
-                                                                   statInt)
-                    VirtualdiskIOWrite = (float(sum(statVirtualdiskIOWrite[0].value[0].value)) / statInt)
-
-                    # VirtualDisk Average Latency
-                    statVirtualdiskLatRead = self.build_perf_query(self.serviceInstance.content,
-                                                                   self.vchtime,
-                                                                   self.stat_check(self.perf_dict, 'virtualDisk.totalReadLatency.average'),
-                                                                   self.get_virtualdisk_scsi(vm, each_vm_hardware),
-                                                                   vm,
-                                                                   statInt)
-                    VirtualdiskLatRead = (float(sum(statVirtualdiskLatRead[0].value[0].value)) / statInt)
-                    VirtualdiskLatRead = "{:.0f}".format(VirtualdiskLatRead) if VirtualdiskLatRead < 25 else "{}{:.0f}{}".format(bcolors.FAIL, VirtualdiskLatRead, bcolors.ENDC)
-
-                    statVirtualdiskLatWrite = self.build_perf_query(self.serviceInstance.content,
-                                                                    self.vchtime,
-                                                                    self.stat_check(self.perf_dict, 'virtualDisk.totalWriteLatency.average'),
-                                                                    self.get_virtualdisk_scsi(vm, each_vm_hardware),
-                                                                    vm,
-                                                                    statInt)
-                    VirtualdiskLatWrite = (float(sum(statVirtualdiskLatWrite[0].value[0].value)) / statInt)
-                    VirtualdiskLatWrite = "{:.0f}".format(VirtualdiskLatWrite) if VirtualdiskLatWrite < 25 else "{}{:.0f}{}".format(bcolors.FAIL, VirtualdiskLatWrite, bcolors.ENDC)
-
-                    if each_vm_hardware.backing.datastore.summary.type != 'vsan':
-                        # Datastore Average IO
-                        statDatastoreIORead = self.build_perf_query(self.serviceInstance.content,
-                                                                    self.vchtime,
-                                                                    self.stat_check(self.perf_dict, 'datastore.numberReadAveraged.average'),
-                                                                    each_vm_hardware.backing.datastore.info.vmfs.uuid,
-                                                                    vm,
-                                                                    statInt)
-                        DatastoreIORead = (float(sum(statDatastoreIORead[0].value[0].value)) / statInt)
-
-                        statDatastoreIOWrite = self.build_perf_query(self.serviceInstance.content,
-                                                                     self.vchtime,
-                                                                     self.stat_check(self.perf_dict, 'datastore.numberWriteAveraged.average'),
-                                                                     each_vm_hardware.backing.datastore.info.vmfs.uuid,
-                                                                     vm,
-                                                                     statInt)
-                        DatastoreIOWrite = (float(sum(statDatastoreIOWrite[0].value[0].value)) / statInt)
-
-                        # Datastore Average Latency
-                        statDatastoreLatRead = self.build_perf_query(self.serviceInstance.content,
-                                                                     self.vchtime,
-                                                                     self.stat_check(self.perf_dict, 'datastore.totalReadLatency.average'),
-                                                                     each_vm_hardware.backing.datastore.info.vmfs.uuid,
-                                                                     vm,
-                                                                     statInt)
-                        DatastoreLatRead = (float(sum(statDatastoreLatRead[0].value[0].value)) / statInt)
-                        DatastoreLatRead = "{:.0f}".format(DatastoreLatRead) if DatastoreLatRead < 25 else "{}{:.0f}{}".format(bcolors.FAIL, DatastoreLatRead, bcolors.ENDC)
-
-                        statDatastoreLatWrite = self.build_perf_query(self.serviceInstance.content,
-                                                                      self.vchtime,
-                                                                      self.stat_check(self.perf_dict, 'datastore.totalWriteLatency.average'),
-                                                                      each_vm_hardware.backing.datastore.info.vmfs.uuid,
-                                                                      vm,
-                                                                      statInt)
-                        DatastoreLatWrite = (float(sum(statDatastoreLatWrite[0].value[0].value)) / statInt)
-                        DatastoreLatWrite = "{:.0f}".format(DatastoreLatWrite) if DatastoreLatWrite < 25 else "{}{:.0f}{}".format(bcolors.FAIL, DatastoreLatWrite, bcolors.ENDC)
-
-                        disk_list.append('Name: {} \r\n'
-                                         '                     Size: {:.1f} GB \r\n'
-                                         '                     Thin: {} \r\n'
-                                         '                     File: {}\r\n'
-                                         '                     VirtualDisk: IORead-{:.0f}, IOWrite-{:.0f}, Latency Read-{} ms, Latency Write-{} ms \r\n'
-                                         '                     Datastore: IORead-{:.0f}, IOWrite-{:.0f}, Latency Read-{} ms, Latency Write-{} ms'.format(each_vm_hardware.deviceInfo.label,
-                                                                                                                                                         each_vm_hardware.capacityInKB / 1024 / 1024,
-                                                                                                                                                         each_vm_hardware.backing.thinProvisioned,
-                                                                                                                                                         each_vm_hardware.backing.fileName,
-                                                                                                                                                         VirtualdiskIORead,
-                                                                                                                                                         VirtualdiskIOWrite,
-                                                                                                                                                         VirtualdiskLatRead,
-                                                                                                                                                         VirtualdiskLatWrite,
-                                                                                                                                                         DatastoreIORead,
-                                                                                                                                                         DatastoreIOWrite,
-                                                                                                                                                         DatastoreLatRead,
-                                                                                                                                                         DatastoreLatWrite))
-
-                    else:
-                        pmObjectType = pbm.ServerObjectRef.ObjectType("virtualDiskId")
-                        pmRef = pbm.ServerObjectRef(key="{}:{}".format(vm._moId, each_vm_hardware.key),
-                                                    objectType=pmObjectType)
-                        profiles = vsadmin.tools.vsanStoragePolicy.GetStorageProfiles(self.pm, pmRef)
-                        storagePolicy = vsadmin.tools.vsanStoragePolicy.ShowStorageProfile(profiles=profiles, verbose=True)
-                        disk_list.append('Name: {} \r\n'
-                                         '                     Size: {:.1f} GB \r\n'
-                                         '                     Thin: {} \r\n'
-                                         '                     File: {} \r\n'
-                                         '                     Storage Policy: {}'
-                                         '                     VirtualDisk: IORead-{:.0f}, IOWrite-{:.0f}, Latency Read-{} ms, Latency Write-{} ms \r\n'.format(each_vm_hardware.deviceInfo.label,
-                                                                                                                                                                each_vm_hardware.capacityInKB / 1024 / 1024,
-                                                                                                                                                                each_vm_hardware.backing.thinProvisioned,
-                                                                                                                                                                each_vm_hardware.backing.fileName,
-                                                                                                                                                                storagePolicy,
-                                                                                                                                                                VirtualdiskIORead,
-                                                                                                                                                                VirtualdiskIOWrite,
-                                                                                                                                                                VirtualdiskLatRead,
-                                                                                                                                                                VirtualdiskLatWrite))
+        # One property retrieve for the whole batch
+        records = dict((record['obj']._moId, record)
+                       for record in vsadmin.tools.inventory.collect_objects(self.serviceInstance, vms,
+                                                                             vim.VirtualMachine, VM_REPORT_PROPERTIES))
+        records = [records[vm._moId] for vm in vms if vm._moId in records]
+        hosts = self.get_host_info(records)
+
+        disks = {}
+        pmRefs = []
+        for record in records:
+            vm = record['obj']
+            devices = record['config.hardware.device'] or []
+            record['has_stats'] = verbose and record['summary.runtime.powerState'] == "poweredOn"
+            record['vsan_entity'] = None
+            vmxDatastoreName = re.match(r'\[(.*)\]', record['summary.config'].vmPathName).group(1)
+            record['vmx_vsan'] = self.get_datastore_info(self.find_datastore_by_name(vmxDatastoreName))['type'] == 'vsan'
+            if record['vmx_vsan']:
+                pmRefs.append(pbm.ServerObjectRef(key=vm._moId,
+                                                  objectType=pbm.ServerObjectRef.ObjectType("virtualMachine")))
+            disks[vm._moId] = []
+            for device in devices:
+                if (device.key >= 2000) and (device.key < 3000):
+                    datastore = self.get_datastore_info(device.backing.datastore)
+                    disk = {'device': device,
+                            'type': datastore['type'],
+                            'scsi': self.get_virtualdisk_scsi(vm, device, devices),
+                            'uuid': None,
+                            'vsan_entity': None}
+                    if record['has_stats'] and disk['type'] != 'vsan':
+                        disk['uuid'] = datastore['uuid']
+                    if disk['type'] == 'vsan':
+                        pmRefs.append(pbm.ServerObjectRef(key="{}:{}".format(vm._moId, device.key),
+                                                          objectType=pbm.ServerObjectRef.ObjectType("virtualDiskId")))
+                    disks[vm._moId].append(disk)
+        policies = self.get_storage_policies(pmRefs)
+
+        stats_records = [record for record in records if record['has_stats']]
+        vsanPerfQuery = None
+        if stats_records:
+            # Plan every counter of the batch and fetch them in a single QueryPerf
+            perfQuery = self.build_perf_query(self.serviceInstance.content, self.vchtime, statInt)
+            for record in stats_records:
+                vm = record['obj']
+                self.add_vm_stats(perfQuery, vm, disks[vm._moId])
+                cluster = hosts.get(record['summary.runtime.host']._moId, (None, None, None))[2]
+                vsanDisks = [disk for disk in disks[vm._moId] if disk['type'] == 'vsan']
+                if isinstance(cluster, vim.ClusterComputeResource) and (record['vmx_vsan'] or vsanDisks):
+                    # The vSAN stats of the whole batch come from one VsanPerfQueryPerf per cluster
+                    if vsanPerfQuery is None:
+                        vsanPerfQuery = self.build_vsan_perf_query(statInt)
+                    instanceUuid = record['summary.config'].instanceUuid
+                    record['vsan_entity'] = vsanPerfQuery.add_vm(cluster, instanceUuid)
+                    for disk in vsanDisks:
+                        disk['vsan_entity'] = vsanPerfQuery.add_disk(cluster, instanceUuid, disk['device'].key)
+            if plans is None:
+                self.run_perf_query(perfQuery)
+            if vsanPerfQuery is not None:
+                self.run_vsan_perf_query(vsanPerfQuery)
+
+        reports = []
+        for record in records:
+            vm = record['obj']
+            config = record['summary.config']
+            devices = record['config.hardware.device'] or []
+            has_stats = record['has_stats']
+            host, cluster = hosts.get(record['summary.runtime.host']._moId, (None, None, None))[:2]
+
+            report = vsadmin.tools.report.VMReport(moref=self.get_moref(vm),
+                                                   instance_uuid=config.instanceUuid,
+                                                   name=config.name,
+                                                   guest_full_name=config.guestFullName,
+                                                   power_state=record['summary.runtime.powerState'],
+                                                   tools_running_status=record['guest.toolsRunningStatus'],
+                                                   tools_status=record['guest.toolsStatus'],
+                                                   tools_version_status=record['guest.toolsVersionStatus'],
+                                                   tools_version=record['guest.toolsVersion'],
+                                                   cluster=cluster,
+                                                   host=host,
+                                                   folder=self.get_folder_path(record['parent']),
+                                                   num_cpu=config.numCpu,
+                                                   memory_mb=config.memorySizeMB,
+                                                   vmx_path=config.vmPathName,
+                                                   annotation=config.annotation,
+                                                   has_stats=has_stats,
+                                                   verbose=verbose)
+            if has_stats and record['vsan_entity'] is not None:
+                report.vsan_stats = vsadmin.tools.report.VsanStatsReport.from_query(vsanPerfQuery,
+                                                                                   record['vsan_entity'])
+
+            for disk in disks[vm._moId]:
+                device = disk['device']
+                diskReport = vsadmin.tools.report.DiskReport(key=device.key,
+                                                             label=device.deviceInfo.label,
+                                                             capacity_kb=device.capacityInKB,
+                                                             thin=device.backing.thinProvisioned,
+                                                             file_name=device.backing.fileName,
+                                                             datastore_type=disk['type'])
+                if has_stats and disk['vsan_entity'] is not None:
+                    diskReport.vsan_stats = vsadmin.tools.report.VsanStatsReport.from_query(vsanPerfQuery,
+                                                                                           disk['vsan_entity'])
+                if diskReport.is_vsan:
+                    diskReport.storage_policies = policies["{}:{}".format(vm._moId, device.key)]
+                report.disks.append(diskReport)
+
+            if has_stats:
+                if plans is None:
+                    self.fill_vm_stats(report, vm, disks[vm._moId], perfQuery)
                 else:
-                    if each_vm_hardware.backing.datastore.summary.type != 'vsan':
-                        disk_list.append('Name: {} \r\n'
-                                         '                     Size: {:.1f} GB \r\n'
-                                         '                     Thin: {} \r\n'
-                                         '                     File: {}'.format(each_vm_hardware.deviceInfo.label,
-                                                                                each_vm_hardware.capacityInKB / 1024 / 1024,
-                                                                                each_vm_hardware.backing.thinProvisioned,
-                                                                                each_vm_hardware.backing.fileName))
-                    else:
-                        pmObjectType = pbm.ServerObjectRef.ObjectType("virtualDiskId")
-                        pmRef = pbm.ServerObjectRef(key="{}:{}".format(vm._moId, each_vm_hardware.key),
-                                                    objectType=pmObjectType)
-                        profiles = vsadmin.tools.vsanStoragePolicy.GetStorageProfiles(self.pm, pmRef)
-                        storagePolicy = vsadmin.tools.vsanStoragePolicy.ShowStorageProfile(profiles=profiles, verbose=False)
-                        disk_list.append('Name: {} \r\n'
-                                         '                     Size: {:.1f} GB \r\n'
-                                         '                     Thin: {} \r\n'
-                                         '                     File: {} \r\n'
-                                         '                     Storage Policy: {}'.format(each_vm_hardware.deviceInfo.label,
-                                                                                          each_vm_hardware.capacityInKB / 1024 / 1024,
-                                                                                          each_vm_hardware.backing.thinProvisioned,
-                                                                                          each_vm_hardware.backing.fileName,
-                                                                                          storagePolicy))
-
-        guestToolsRunningStatus = "{}{}{}".format(bcolors.OKGREEN, "Running", bcolors.ENDC) if vm.guest.toolsRunningStatus == "guestToolsRunning" else "{}{}{}".format(bcolors.FAIL, "Not running", bcolors.ENDC)
-        guestToolsStatus = "{}{}{}".format(bcolors.OKGREEN, "OK", bcolors.ENDC) if vm.guest.toolsStatus == "toolsOk" else "{}{}{}".format(bcolors.FAIL, "Need Attention", bcolors.ENDC)
-        guestToolsVersionStatus = "{}{}{}".format(bcolors.OKGREEN, "Current", bcolors.ENDC) if vm.guest.toolsVersionStatus == "guestToolsCurrent" else "{}{}{}".format(bcolors.WARNING, "Need upgrade", bcolors.ENDC)
-        guestToolsVersion = vm.guest.toolsVersion
-
-        powerStatus = "{}{}{}".format(bcolors.OKGREEN, summary.runtime.powerState, bcolors.ENDC) if summary.runtime.powerState == "poweredOn" else "{}{}{}".format(bcolors.FAIL, summary.runtime.powerState, bcolors.ENDC)
-
-        print("UUID               : {}".format(summary.config.instanceUuid))
-        print("Name               : {}".format(summary.config.name))
-        print("VMRC               : vmrc://{}:443/?moid={}".format(self.server, self.get_moref(vm)))
-        print("Guest              : {}".format(summary.config.guestFullName))
-        print("State              : {}".format(powerStatus))
-        print("Guest Tools Status : Status: {} | Version Status: {} | Version: {} | Health: {}".format(guestToolsRunningStatus, guestToolsVersionStatus, guestToolsVersion, guestToolsStatus))
-        print("Cluster            : {}".format(summary.runtime.host.parent.name))
-        print("Host               : {}".format(summary.runtime.host.name))
-        print("Folder             : {}".format(self.print_folder_tree(vm)))
-        print("Number of vCPUs    : {}".format(summary.config.numCpu))
-        print("Memory             : {}".format(memory))
-        print("VM .vmx Path       : {}".format(summary.config.vmPathName))
-
-        vmxDatastoreName = re.match(r'\[(.*)\]', summary.config.vmPathName).group(1)
-        vmxDatastore = self.find_datastore_by_name(vmxDatastoreName)
-        if vmxDatastore.summary.type == 'vsan':
-            pmObjectType = pbm.ServerObjectRef.ObjectType("virtualMachine")
-            pmRef = pbm.ServerObjectRef(key=vm._moId,
-                                        objectType=pmObjectType)
-            profiles = vsadmin.tools.vsanStoragePolicy.GetStorageProfiles(self.pm, pmRef)
-            storagePolicy = vsadmin.tools.vsanStoragePolicy.ShowStorageProfile(profiles=profiles, verbose=verbose)
-            print("                     Storage Policy: {}".format(storagePolicy))
-
-        print("Virtual Disks      :")
-        if len(disk_list) > 0:
-            first = True
-            for each_disk in disk_list:
-                if first:
-                    first = False
-                else:
-                    print("")
-                print("                     {}".format(each_disk))
+                    plans.append((report, vm, disks[vm._moId]))
+
+            if record['vmx_vsan']:
+                report.storage_policies = policies[vm._moId]
 
-        if vm.guest.net != []:
-            print("Network            : ")
-            for card in vm.guest.net:
-                print("                     Name: {}".format(card.network))
+            for card in record['guest.net'] or []:
+                connected = None
                 if card.deviceConfigId != -1:
-                    hwdevice = next((item for item in vm.config.hardware.device if item.key == card.deviceConfigId), None)
-                    print("                     Connected: {}".format(hwdevice.connectable.connected))
-                print("                     Mac: {}".format(card.macAddress))
-                if card.ipConfig is not None:
-                    for ips in card.ipConfig.ipAddress:
-                        print("                     IP: {}".format(ips.ipAddress))
-                print("")
-        if vm.guest.ipStack != []:
-            for gateway in vm.guest.ipStack[0].ipRouteConfig.ipRoute:
-                if gateway.network == '0.0.0.0':
-                    print("                     Default GW: {}".format(gateway.gateway.ipAddress))
-            print("")
-            print("Guest Hostname     : {}".format(vm.guest.ipStack[0].dnsConfig.hostName))
-            print("DNS                :")
-            for dns in vm.guest.ipStack[0].dnsConfig.ipAddress:
-                print("                     Address: {}".format(dns))
-            print("                     Search Domain: {}".format(vm.guest.ipStack[0].dnsConfig.domainName))
-
-        customfields = next((item for item in summary.customValue if item.key == self.lastnetworkinfokey), None)
-        if customfields is not None and customfields.value != "":
-            print("Last Network Info  : {}".format(customfields.value))
-
-        if summary.runtime.question is not None:
-            print("Question  : {}".format(summary.runtime.question.text))
-
-        annotation = summary.config.annotation
-        if annotation is not None and annotation != "":
-            print("Notes              : {}".format(annotation))
+                    hwdevice = next((item for item in devices if item.key == card.deviceConfigId), None)
+                    if hwdevice is not None:
+                        connected = hwdevice.connectable.connected
+                ips = [ips.ipAddress for ips in card.ipConfig.ipAddress] if card.ipConfig is not None else []
+                report.nics.append(vsadmin.tools.report.NicReport(card.network, connected, card.macAddress, ips))
+
+            ipStack = record['guest.ipStack'] or []
+            report.has_ip_stack = len(ipStack) > 0
+            if report.has_ip_stack:
+                report.gateways = [gateway.gateway.ipAddress for gateway in ipStack[0].ipRouteConfig.ipRoute
+                                   if gateway.network == '0.0.0.0']
+                dnsConfig = ipStack[0].dnsConfig
+                report.guest_hostname = dnsConfig.hostName if dnsConfig else None
+                report.dns_servers = list(dnsConfig.ipAddress) if dnsConfig else []
+                report.search_domain = dnsConfig.domainName if dnsConfig else None
+
+            customfields = next((item for item in record['customValue'] or [] if item.key == self.lastnetworkinfokey), None)
+            if customfields is not None and customfields.value != "":
+                report.last_network_info = customfields.value
+
+            question = record['summary.runtime.question']
+            if question is not None:
+                report.question = question.text
+
+            reports.append(report)
+        return reports
 
     def get_all_objs(self, vimtype, folder=None, recurse=True):
         if not folder:
             folder = self.serviceInstance.content.rootFolder
         obj = {}
-        container = self.serviceInstance.content.viewManager.CreateContainerView(folder, vimtype, recurse)
-        for managed_object_ref in container.view:
-            obj.update({managed_object_ref: managed_object_ref.name})
+        for obj_type in vimtype:
+            for record in vsadmin.tools.inventory.collect(self.serviceInstance, obj_type, ['name'],
+                                                          container=folder, recurse=recurse):
+                obj.update({record['obj']: record['name']})
         return obj
 
     def find_object_by_name(self, name, obj_type, folder=None, recurse=True):
         if not isinstance(obj_type, list):
             obj_type = [obj_type]
         objects = self.get_all_objs(obj_type, folder=folder, recurse=recurse)
-        for obj in objects:
-            if obj.name == name:
+        for obj, obj_name in objects.items():
+            if obj_name == name:
                 return obj
         return None
 
     def find_datastore_by_name(self, datastore_name):
-        return self.find_object_by_name(datastore_name, [vim.Datastore])
+        for datastore in self.datastores.values():
+            if datastore['name'] == datastore_name:
+                return datastore['obj']
+        return None
 
-    def search_vm_by_name(self, name, name_contain=False):
-        content = self.serviceInstance.content
-        root_folder = content.rootFolder
-        objView = content.viewManager.CreateContainerView(root_folder,
-                                                          [vim.VirtualMachine],
-                                                          True)
-        vmList = objView.view
-        objView.Destroy()
+    def search_vm_by_name(self, name, name_contain=False, match='regex'):
+        if name_contain:
+            matcher = vsadmin.tools.matcher.compile_matcher(name, match)
+        if self.use_index:
+            if name_contain:
+                morefs = self.inventory_index.find_by_name_matching(matcher)
+            else:
+                morefs = self.inventory_index.find_by_name(name)
+            return [self.get_vm_by_moref(moref) for moref in morefs]
         obj = []
-        for vm in vmList:
+        for record in vsadmin.tools.inventory.collect(self.serviceInstance, vim.VirtualMachine, ['name']):
             if not name_contain:
-                if (vm.name == name):
-                    obj.append(vm)
+                if (record['name'] == name):
+                    obj.append(record['obj'])
                     return obj
             else:
-                if re.match(".*%s.*" % name, vm.name):
-                    obj.append(vm)
+                if matcher(record['name']):
+                    obj.append(record['obj'])
         return obj
 
     def search_vm_by_ip(self, ip, custom_fields=False):
         obj = []
         content = self.serviceInstance.content
-        root_folder = content.rootFolder
 
         if not NetworkCheck.checkIP(ip):
             print("IP address {} is invalid.".format(ip))
             return obj
+        if self.use_index:
+            obj = [self.get_vm_by_moref(moref) for moref in self.inventory_index.find_by_ip(ip)]
+            if obj:
+                return obj
         search_obj = content.searchIndex.FindByIp(None,
                                                   ip,
                                                   True)
         if search_obj:
             obj.append(search_obj)
             return obj
+        elif custom_fields and self.use_index:
+            obj = [self.get_vm_by_moref(moref) for moref in self.inventory_index.find_by_custom_value(self.lastnetworkinfokey, ip)]
         elif custom_fields:
-            objView = content.viewManager.CreateContainerView(root_folder,
-                                                              [vim.VirtualMachine],
-                                                              True)
-            vmList = objView.view
-            for vm in vmList:
-                summary = vm.summary
-                customfields = next((item for item in summary.customValue if item.key == self.lastnetworkinfokey), None)
+            for record in vsadmin.tools.inventory.collect(self.serviceInstance, vim.VirtualMachine, ['customValue']):
+                customfields = next((item for item in record['customValue'] or [] if item.key == self.lastnetworkinfokey), None)
                 if customfields is not None and customfields.value != "":
                     if ip in customfields.value:
-                        if vm not in obj:
-                            obj.append(vm)
+                        if record['obj'] not in obj:
+                            obj.append(record['obj'])
         return obj
 
     def search_vm_by_mac(self, mac):
+        """Search virtual machines by MAC addresses or MAC prefixes
+
+        :param mac: One MAC address or a list of them, addresses with less
+            than six octets (e.g. an OUI) match as a prefix
+        :type mac: str or list
+        :returns: The matching virtual machines in the order of the addresses
+        :rtype: list
+        """
         obj = []
-        if not NetworkCheck.checkMAC(mac):
-            print("MAC address {} is invalid.".format(mac))
-            return obj
-
-        content = self.serviceInstance.content
-        root_folder = content.rootFolder
-        objView = content.viewManager.CreateContainerView(root_folder,
-                                                          [vim.VirtualMachine],
-                                                          True)
-        vmList = objView.view
-        objView.Destroy()
-        for vm in vmList:
-            vm_hardware = vm.config.hardware
-            for each_vm_hardware in vm_hardware.device:
-                if (each_vm_hardware.key >= 4000) and (each_vm_hardware.key < 5000):
-                    if re.search('.*{}.*'.format(mac), each_vm_hardware.macAddress):
-                        obj.append(vm)
-                        break
+        macs = []
+        for each_mac in ([mac] if isinstance(mac, str) else mac):
+            normalized = vsadmin.tools.macIndex.normalize_mac(each_mac)
+            if normalized is None:
+                print("MAC address {} is invalid.".format(each_mac))
+            else:
+                macs.append(normalized)
+        for each_mac in macs:
+            if self.use_index:
+                if vsadmin.tools.macIndex.is_prefix(each_mac):
+                    morefs = self.inventory_index.find_by_mac_prefix(each_mac)
+                else:
+                    morefs = self.inventory_index.find_by_mac(each_mac)
+                found = [self.get_vm_by_moref(moref) for moref in morefs]
+            else:
+                found = self.find_vms_by_mac(each_mac)
+            for vm in found:
+                if vm not in obj:
+                    obj.append(vm)
         return obj
 
     def search_vm_by_hostname(self, hostname):
+        if self.use_index:
+            obj = [self.get_vm_by_moref(moref) for moref in self.inventory_index.find_by_hostname(hostname)]
+            if obj:
+                return obj
         obj = []
         search_obj = self.serviceInstance.content.searchIndex.FindByDnsName(None, hostname, True)
         if search_obj:
             obj.append(search_obj)
         return obj
 
-    def search_vm_by_task(self, task):
-        content = self.serviceInstance.content
-        root_folder = content.rootFolder
-        objView = content.viewManager.CreateContainerView(root_folder, [vim.VirtualMachine], True)
-        vmList = objView.view
-        objView.Destroy()
+    def search_vm_by_task(self, task, match='regex'):
+        matcher = vsadmin.tools.matcher.compile_matcher(task, match)
+        if self.use_index:
+            return [self.get_vm_by_moref(moref) for moref in self.inventory_index.find_by_annotation_matching(matcher)]
         obj = []
-        for vm in vmList:
-            if vm.summary.config.annotation and vm.summary.config.annotation != "":
-                if re.search('.*{}.*'.format(task), vm.summary.config.annotation):
-                    obj.append(vm)
+        for record in vsadmin.tools.inventory.collect(self.serviceInstance, vim.VirtualMachine, ['config.annotation']):
+            if matcher(record['config.annotation']):
+                obj.append(record['obj'])
         return obj
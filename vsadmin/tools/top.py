@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import vsadmin.tools.inventory
+import vsadmin.tools.report
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim
+
+# vCenter advanced setting limiting the number of metrics of one QueryPerf
+MAX_QUERY_METRICS_SETTING = 'config.vpxd.stats.maxQueryMetrics'
+
+# vCenter default of the setting
+DEFAULT_MAX_QUERY_METRICS = 64
+
+# Metrics per QueryPerf when the setting disables the limit (-1)
+UNLIMITED_QUERY_METRICS = 4096
+
+MEMORY_BALLOON_COUNTER = 'mem.vmmemctl.average'
+MEMORY_SWAPPED_COUNTER = 'mem.swapped.average'
+DISK_IO_COUNTERS = ('virtualDisk.numberReadAveraged.average',
+                    'virtualDisk.numberWriteAveraged.average')
+DISK_LATENCY_COUNTERS = ('virtualDisk.totalReadLatency.average',
+                         'virtualDisk.totalWriteLatency.average')
+
+CONTAINER_TYPES = {'cluster': vim.ClusterComputeResource,
+                   'host': vim.HostSystem,
+                   'folder': vim.Folder}
+
+
+def instance_means(perfQuery, means, entity, counter_ids):
+    """Return the mean of every instance series of the counters
+
+    :param perfQuery: An executed query with the counters registered for "*"
+    :type perfQuery: vsadmin.tools.perfQuery.PerfQuery
+    :param means: The means of all the series of the query, by metric key
+    :type means: dict
+    :returns: The means, without the aggregate "" instance and series
+        without valid samples
+    :rtype: list
+    """
+    result = []
+    for counter_id in counter_ids:
+        for instance in perfQuery.instances(entity, counter_id):
+            value = means.get(perfQuery.metric_key(entity, counter_id, instance))
+            if instance != "" and value is not None:
+                result.append(value)
+    return result
+
+
+def rank(reports, metric, count=10):
+    """Return the reports with the highest value of a metric
+
+    :param reports: The statistics of the virtual machines
+    :type reports: list of TopReport
+    :param metric: One of :data:`vsadmin.tools.report.TOP_METRICS`
+    :type metric: str
+    :param count: Number of reports to return
+    :type count: int
+    :rtype: list of TopReport
+    """
+    # Virtual machines without samples come last
+    return sorted(reports, key=lambda report: (getattr(report, metric) is not None, getattr(report, metric) or 0),
+                  reverse=True)[:count]
+
+
+class TopCollector(object):
+    """Collect the statistics of every powered on virtual machine below a container
+
+    The counters of many virtual machines are fetched together, each
+    QueryPerf carrying as many metrics as vCenter accepts
+    (``config.vpxd.stats.maxQueryMetrics``). Virtual disk counters are
+    requested for all instances at once with "*".
+
+    :param vc: A connected vCenter
+    :type vc: vsadmin.tools.tools.vCenter
+    :param interval: Minutes to average the statistics over
+    :type interval: int
+    :param jobs: Number of QueryPerf calls in flight
+    :type jobs: int
+    """
+
+    def __init__(self, vc, interval=20, jobs=1):
+        self.vc = vc
+        self.interval = interval
+        self.jobs = jobs
+        self.content = vc.serviceInstance.content
+        if jobs > 1:
+            stub = vc.serviceInstance._stub
+            stub.poolSize = max(stub.poolSize, jobs)
+
+    def find_container(self, kind, name):
+        """Find a cluster, host or folder by name
+
+        :param kind: One of the keys of :data:`CONTAINER_TYPES`
+        :type kind: str
+        :param name: The name of the container
+        :type name: str
+        :returns: The container or None
+        """
+        return self.vc.find_object_by_name(name, CONTAINER_TYPES[kind])
+
+    def max_query_metrics(self):
+        try:
+            options = self.content.setting.QueryView(name=MAX_QUERY_METRICS_SETTING)
+        except vim.fault.InvalidName:
+            # The setting is not set, vCenter applies its default
+            return DEFAULT_MAX_QUERY_METRICS
+        limit = int(options[0].value) if options else DEFAULT_MAX_QUERY_METRICS
+        return limit if limit > 0 else UNLIMITED_QUERY_METRICS
+
+    def counters(self):
+        """Return the counter id of every counter of a virtual machine, by name"""
+        names = (MEMORY_BALLOON_COUNTER, MEMORY_SWAPPED_COUNTER) + DISK_IO_COUNTERS + DISK_LATENCY_COUNTERS
+        return dict((name, self.vc.stat_check(self.vc.perf_dict, name)) for name in names)
+
+    def powered_on_vms(self, container):
+        return [record['obj'] for record in vsadmin.tools.inventory.collect(self.vc.serviceInstance, vim.VirtualMachine,
+                                                                            ['runtime.powerState'],
+                                                                            container=container)
+                if record['runtime.powerState'] == 'poweredOn']
+
+    def collect_batch(self, vms, names, counters):
+        perfQuery = self.vc.build_perf_query(self.content, self.vc.vchtime, self.interval)
+        for vm in vms:
+            for name, counter_id in counters.items():
+                perfQuery.add(vm, counter_id, "*" if name.startswith('virtualDisk.') else "")
+        perfQuery.execute()
+        with self.vc.stats_lock:
+            self.vc.perf_round_trips += perfQuery.round_trips
+            self.vc.perf_round_trips_saved += perfQuery.round_trips_saved
+
+        # The means of every series of the batch in one pass
+        means = perfQuery.series.reduce('mean')
+        reports = []
+        for vm in vms:
+            balloon = means.get(perfQuery.metric_key(vm, counters[MEMORY_BALLOON_COUNTER]))
+            swap = means.get(perfQuery.metric_key(vm, counters[MEMORY_SWAPPED_COUNTER]))
+            iops = instance_means(perfQuery, means, vm, [counters[name] for name in DISK_IO_COUNTERS])
+            latency = instance_means(perfQuery, means, vm, [counters[name] for name in DISK_LATENCY_COUNTERS])
+            reports.append(vsadmin.tools.report.TopReport(moref=vm._moId,
+                                                          name=names[vm._moId],
+                                                          iops=sum(iops) if iops else None,
+                                                          latency=max(latency) if latency else None,
+                                                          balloon=balloon / 1024 if balloon is not None else None,
+                                                          swap=swap / 1024 if swap is not None else None))
+        return reports
+
+    def collect(self, container):
+        """Collect the statistics of the powered on virtual machines below a container
+
+        :rtype: list of TopReport
+        """
+        vms = self.powered_on_vms(container)
+        if not vms:
+            return []
+        names = dict((record['obj']._moId, record['name'])
+                     for record in vsadmin.tools.inventory.collect_objects(self.vc.serviceInstance, vms,
+                                                                           vim.VirtualMachine, ['name']))
+        counters = self.counters()
+        batch_size = max(1, self.max_query_metrics() // len(counters))
+        batches = [vms[i:i + batch_size] for i in range(0, len(vms), batch_size)]
+        reports = []
+        if self.jobs <= 1 or len(batches) <= 1:
+            for batch in batches:
+                reports.extend(self.collect_batch(batch, names, counters))
+            return reports
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for batch_reports in executor.map(lambda batch: self.collect_batch(batch, names, counters), batches):
+                reports.extend(batch_reports)
+        return reports
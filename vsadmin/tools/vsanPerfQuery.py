@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from pyVmomi import vim
+# Registers the vim.cluster.VsanPerf* types
+import vsadmin.tools.vsanmgmtObjects
+
+# Report field and vSAN performance metric label of the statistics shown
+# for virtual machines and virtual disks
+VSAN_METRICS = OrderedDict([('iops_read', 'iopsRead'),
+                            ('iops_write', 'iopsWrite'),
+                            ('throughput_read', 'throughputRead'),
+                            ('throughput_write', 'throughputWrite'),
+                            ('latency_read', 'latencyRead'),
+                            ('latency_write', 'latencyWrite'),
+                            ('congestion_read', 'readCongestion'),
+                            ('congestion_write', 'writeCongestion')])
+
+
+def vm_entity(instance_uuid):
+    """Return the vSAN performance entity of a virtual machine
+
+    :param instance_uuid: The vCenter instance UUID of the virtual machine
+    :type instance_uuid: str
+    :rtype: str
+    """
+    return 'virtual-machine:{}'.format(instance_uuid)
+
+
+def disk_entity(instance_uuid, disk_key):
+    """Return the vSAN performance entity of a virtual disk
+
+    :param instance_uuid: The vCenter instance UUID of the virtual machine
+    :type instance_uuid: str
+    :param disk_key: The device key of the virtual disk
+    :type disk_key: int
+    :rtype: str
+    """
+    return 'virtual-disk:{}:{}'.format(instance_uuid, disk_key)
+
+
+def parse_csv_values(values):
+    """Parse the comma separated samples of a vSAN metric series
+
+    :param values: The ``values`` of a VsanPerfMetricSeriesCSV
+    :type values: str
+    :returns: The samples, missing ones are left out
+    :rtype: list
+    """
+    if not values:
+        return []
+    return [float(value) for value in values.split(',') if value not in ('', 'None')]
+
+
+class VsanPerfQuery(object):
+    """Collect vSAN performance metrics of many entities in one VsanPerfQueryPerf per cluster
+
+    The vSAN counterpart of :class:`vsadmin.tools.perfQuery.PerfQuery`:
+    entities are registered with :meth:`add`, fetched with :meth:`execute`
+    and their samples, parsed from CSV once, are read back with
+    :meth:`values` and :meth:`average`.
+    """
+
+    def __init__(self, perf_system, start_time, end_time):
+        self.perf_system = perf_system
+        self.start_time = start_time
+        self.end_time = end_time
+        self.clusters = OrderedDict()
+        self.results = {}
+        self.round_trips = 0
+        # The report fields and metric labels read by VsanStatsReport
+        self.metrics = VSAN_METRICS
+
+    def add(self, cluster, entity_ref_id):
+        """Register an entity to be fetched
+
+        :param cluster: The vSAN cluster the entity belongs to
+        :type cluster: vim.ClusterComputeResource
+        :param entity_ref_id: The vSAN performance entity, see :func:`vm_entity`
+            and :func:`disk_entity`
+        :type entity_ref_id: str
+        :returns: The entity
+        :rtype: str
+        """
+        entities = self.clusters.setdefault(cluster._moId, (cluster, []))[1]
+        if entity_ref_id not in entities:
+            entities.append(entity_ref_id)
+        return entity_ref_id
+
+    def add_vm(self, cluster, instance_uuid):
+        """Register a virtual machine, returns its entity"""
+        return self.add(cluster, vm_entity(instance_uuid))
+
+    def add_disk(self, cluster, instance_uuid, disk_key):
+        """Register a virtual disk, returns its entity"""
+        return self.add(cluster, disk_entity(instance_uuid, disk_key))
+
+    def build_query_specs(self, entity_ref_ids):
+        return [vim.cluster.VsanPerfQuerySpec(entityRefId=entity_ref_id,
+                                              startTime=self.start_time,
+                                              endTime=self.end_time)
+                for entity_ref_id in entity_ref_ids]
+
+    def execute(self):
+        """Fetch every registered entity, one VsanPerfQueryPerf call per cluster"""
+        for cluster, entity_ref_ids in self.clusters.values():
+            entity_metrics = self.perf_system.VsanPerfQueryPerf(querySpecs=self.build_query_specs(entity_ref_ids),
+                                                                cluster=cluster)
+            self.round_trips += 1
+            for entity_metric in entity_metrics or []:
+                series = self.results.setdefault(entity_metric.entityRefId, {})
+                for metric in entity_metric.value or []:
+                    series[metric.metricId.label] = parse_csv_values(metric.values)
+
+    def values(self, entity_ref_id, label):
+        """Return the samples of a metric
+
+        :returns: A list of sample values, empty if the server returned none
+        :rtype: list
+        """
+        return self.results.get(entity_ref_id, {}).get(label, [])
+
+    def average(self, entity_ref_id, label):
+        """Return the mean of the samples of a metric, None without samples"""
+        values = self.values(entity_ref_id, label)
+        if not values:
+            return None
+        return sum(values) / len(values)
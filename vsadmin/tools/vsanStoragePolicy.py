@@ -1,4 +1,10 @@
-from pyVmomi import pbm, VmomiSupport, SoapStubAdapter
+import threading
+import vsadmin.tools.profiler
+from pyVmomi import pbm, SoapStubAdapter
+
+# Storage Policy profiles already retrieved by this process, keyed by profile uniqueId
+_profileCache = {}
+_profileCacheLock = threading.Lock()
 
 def PbmConnect(stubAdapter, disable_ssl_verification=False):
     """Connect to the VMware Storage Policy Server
@@ -21,77 +27,60 @@ def PbmConnect(stubAdapter, disable_ssl_verification=False):
     else:
         sslContext = None
 
-    VmomiSupport.GetRequestContext()["vcSessionCookie"] = \
-        stubAdapter.cookie.split('"')[1]
+    # Pass the vCenter session with every request instead of through the
+    # thread-local request context, so the stub can be used from any thread
+    requestContext = {"vcSessionCookie": stubAdapter.cookie.split('"')[1]}
     hostname = stubAdapter.host.split(":")[0]
     pbmStub = SoapStubAdapter(
         host=hostname,
         version="pbm.version.version1",
         path="/pbm/sdk",
         poolSize=0,
-        sslContext=sslContext)
+        sslContext=sslContext,
+        requestContext=requestContext)
+    vsadmin.tools.profiler.instrument(pbmStub, 'pbm')
     pbmSi = pbm.ServiceInstance("ServiceInstance", pbmStub)
     pbmContent = pbmSi.RetrieveContent()
     return pbmContent
 
 
-def GetStorageProfiles(profileManager, ref):
-    """Get vmware storage policy profiles associated with specified entities
+def GetStorageProfilesBatch(profileManager, refs):
+    """Get vmware storage policy profiles associated with many entities
+
+    The associations of all entities are queried with a single
+    PbmQueryAssociatedProfiles call and the profiles not retrieved before
+    by this process with a single PbmRetrieveContent call.
 
     :param profileManager: A VMware Storage Policy Service manager object
     :type profileManager: pbm.profile.ProfileManager
-    :param ref: A server reference to a virtual machine, virtual disk,
-        or datastore
-    :type ref: pbm.ServerObjectRef
-    :returns: A list of VMware Storage Policy profiles associated with
-        the specified entities
-    :rtype: pbm.profile.Profile[]
+    :param refs: Server references to virtual machines, virtual disks,
+        or datastores
+    :type refs: pbm.ServerObjectRef[]
+    :returns: A dict mapping the key of every reference to the list of
+        VMware Storage Policy profiles associated with it
+    :rtype: dict
     """
 
-    profiles = []
-    profileIds = profileManager.PbmQueryAssociatedProfile(ref)
-    if len(profileIds) > 0:
-        profiles = profileManager.PbmRetrieveContent(profileIds=profileIds)
-        return profiles
-    return profiles
-
+    associations = dict((ref.key, []) for ref in refs)
+    if not refs:
+        return associations
+    results = profileManager.PbmQueryAssociatedProfiles(entities=refs)
+    for result in results:
+        associations[result.object.key] = list(result.profileId or [])
 
-def ShowStorageProfileCapabilities(capabilities):
-    """Print vmware storage policy profile capabilities
-
-    :param capabilities: A list of VMware Storage Policy profile
-        associated capabilities
-    :type capabilities: pbm.capability.AssociatedPolicyCapabilities
-    :returns: str
-    """
-    result = ""
-    for capability in capabilities:
-        for constraint in capability.constraint:
-            if hasattr(constraint, 'propertyInstance'):
-                for propertyInstance in constraint.propertyInstance:
-                    result += "                                     Parameter: {} Value: {}\r\n".format(propertyInstance.id,
-                                                                                                    propertyInstance.value)
-    return result
+    with _profileCacheLock:
+        missing = {}
+        for profileIds in associations.values():
+            for profileId in profileIds:
+                if profileId.uniqueId not in _profileCache:
+                    missing[profileId.uniqueId] = profileId
+    if missing:
+        profiles = profileManager.PbmRetrieveContent(profileIds=list(missing.values()))
+        with _profileCacheLock:
+            for profile in profiles:
+                _profileCache[profile.profileId.uniqueId] = profile
 
-
-def ShowStorageProfile(profiles, verbose=False):
-    """Print vmware storage policy profile
-
-    :param profiles: A list of VMware Storage Policy profiles
-    :type profiles: pbm.profile.Profile[]
-    :returns: str
-    """
-    result = ""
-    if len(profiles) > 0:
-        for profile in profiles:
-            result += "Name: {} \r\n".format(profile.name)
-            if verbose:
-                result += "                                     Description: {} \r\n".format(profile.description)
-            if hasattr(profile.constraints, 'subProfiles') and verbose:
-                subprofiles = profile.constraints.subProfiles
-                for subprofile in subprofiles:
-                    capabilities = subprofile.capability
-                    result += ShowStorageProfileCapabilities(capabilities)
-    else:
-        result += "Name: Datastore Default \r\n"
-    return result
+    with _profileCacheLock:
+        return dict((key, [_profileCache[profileId.uniqueId] for profileId in profileIds
+                           if profileId.uniqueId in _profileCache])
+                    for key, profileIds in associations.items())
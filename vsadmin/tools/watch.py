@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import collections
+import datetime
+import sys
+import time
+import vsadmin.tools.perfSeries
+import vsadmin.tools.report
+import vsadmin.tools.tools
+
+# Clears the terminal and moves the cursor to its top left corner
+CLEAR_SCREEN = '\033[H\033[2J'
+
+
+class VMWatcher(object):
+    """Keep the vSphere statistics of virtual machines up to date
+
+    The first :meth:`refresh` builds the reports and fetches the whole
+    ``interval`` window. The counters, virtual disk instances and
+    datastore UUIDs are resolved once into a single
+    :class:`vsadmin.tools.perfQuery.PerfQuery`; every later refresh only
+    moves its start time to the newest sample received, so each tick is
+    one QueryPerf returning the new samples. The statistics are the means
+    over a window of ``interval`` minutes rolling with them. vSAN
+    statistics, sampled every 5 minutes, are only fetched on the first
+    load.
+
+    :param vc: A connected vCenter
+    :type vc: vsadmin.tools.tools.vCenter
+    :param vms: The virtual machines to watch
+    :type vms: list of vim.VirtualMachine
+    :param interval: Minutes to average the statistics over
+    :type interval: int
+    """
+
+    def __init__(self, vc, vms, interval=20):
+        self.vc = vc
+        self.vms = vms
+        self.interval = interval
+        self.reports = []
+        self.plans = []
+        self.perfQuery = None
+        # Samples of the rolling window, (timestamps, values) by metric key
+        self.window = {}
+
+    def load(self):
+        """Build the reports and plan the statistics of every virtual machine"""
+        for i in range(0, len(self.vms), vsadmin.tools.tools.REPORT_BATCH_SIZE):
+            batch = self.vms[i:i + vsadmin.tools.tools.REPORT_BATCH_SIZE]
+            self.reports.extend(self.vc.collect_vm_reports(batch, interval=self.interval, verbose=True,
+                                                           plans=self.plans))
+        self.perfQuery = self.vc.build_perf_query(self.vc.serviceInstance.content, self.vc.vchtime, self.interval)
+        # Newer samples are fetched on every refresh
+        self.perfQuery.end_time = None
+        self.perfQuery.max_sample = None
+        for report, vm, disks in self.plans:
+            self.vc.add_vm_stats(self.perfQuery, vm, disks)
+
+    def last_timestamp(self):
+        """Return the POSIX timestamp of the newest sample of the window, None without samples"""
+        timestamps = [series[0][-1] for series in self.window.values() if series[0]]
+        return max(timestamps) if timestamps else None
+
+    def update_window(self):
+        """Append the samples of the last QueryPerf and drop the ones older than the interval"""
+        series = self.perfQuery.series
+        for key in series.keys():
+            timestamps, values = self.window.setdefault(key, (collections.deque(), collections.deque()))
+            last = timestamps[-1] if timestamps else None
+            for timestamp, value in zip(series.sample_times(key), series.samples(key)):
+                if last is None or timestamp > last:
+                    timestamps.append(timestamp)
+                    values.append(value)
+        newest = self.last_timestamp()
+        if newest is None:
+            return
+        oldest = newest - self.interval * 60
+        for timestamps, values in self.window.values():
+            while timestamps and timestamps[0] <= oldest:
+                timestamps.popleft()
+                values.popleft()
+
+    def refresh(self):
+        """Fetch the samples newer than the last refresh and update the reports
+
+        :returns: The reports
+        :rtype: list of vsadmin.tools.report.VMReport
+        """
+        if self.perfQuery is None:
+            self.load()
+        else:
+            last = self.last_timestamp()
+            if last is not None:
+                # QueryPerf only returns the samples taken after startTime
+                self.perfQuery.start_time = datetime.datetime.fromtimestamp(last, datetime.timezone.utc)
+        if self.plans:
+            # No error when vCenter has no new sample yet, unlike run_perf_query
+            self.perfQuery.execute()
+            with self.vc.stats_lock:
+                self.vc.perf_round_trips += 1
+            self.update_window()
+            # The means are taken over the whole window, not only the new samples
+            table = vsadmin.tools.perfSeries.SeriesTable()
+            for key, (timestamps, values) in self.window.items():
+                table.add(key, list(timestamps), list(values))
+            self.perfQuery.series = table
+            for report, vm, disks in self.plans:
+                self.vc.fill_vm_stats(report, vm, disks, self.perfQuery)
+        return self.reports
+
+
+def watch(vc, vms, seconds, interval=20, output='text', stream=None, ticks=None):
+    """Show the reports of virtual machines, refreshed every few seconds
+
+    In text mode the reports are redrawn in place when the output is a
+    terminal. With ndjson every refresh writes one record per virtual
+    machine.
+
+    :param seconds: Seconds between two refreshes
+    :type seconds: float
+    :param output: ``text`` or ``ndjson``
+    :type output: str
+    :param stream: Where to write to (default is stdout)
+    :param ticks: Number of refreshes before returning (default is until interrupted)
+    :type ticks: int
+    """
+    if stream is None:
+        stream = sys.stdout
+    watcher = VMWatcher(vc, vms, interval=interval)
+    tick = 0
+    while ticks is None or tick < ticks:
+        if tick:
+            time.sleep(seconds)
+        reports = watcher.refresh()
+        if output == 'text':
+            if stream.isatty():
+                stream.write(CLEAR_SCREEN)
+            stream.write('Every {}s, last {} minute(s): {}\n'.format(seconds, interval, time.strftime('%H:%M:%S')))
+        vsadmin.tools.report.write_reports(reports, vc.server, output=output, stream=stream)
+        tick += 1